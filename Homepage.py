@@ -1,57 +1,43 @@
 import streamlit as st
-import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
 
+from scripts.cube import CUBE_STORE, rollup, select, total
+from scripts.data_access import load_cube, load_filter_index, load_image
+from scripts.funnel import ENGAGED_STAGES
+
+# The app theme lives in .streamlit/config.toml (read once at server start);
+# this page renders no charts of its own, only the exported PNGs, so it
+# imports no plotting library
 st.set_page_config(page_title="Silent Leak Detector", layout="wide")
 
-# === GitHub-style theme settings ===
-sns.set_style("whitegrid")
-sns.set_context("notebook", font_scale=1.1)
-plt.rcParams.update({
-    "figure.facecolor": "white",
-    "axes.facecolor": "white",
-    "axes.edgecolor": "#D0D7DE",
-    "axes.labelcolor": "#24292F",
-    "xtick.color": "#57606A",
-    "ytick.color": "#57606A",
-    "grid.color": "#D0D7DE",
-    "text.color": "#24292F",
-    "axes.titleweight": "bold",
-    "axes.titlesize": 14,
-    "axes.labelsize": 12,
-    "font.family": "Helvetica Neue"
-})
-
-# Load data
-df = pd.read_csv('data/cleaned_sessions.csv')
-
-# Preprocessing
-df['conversion_rate'] = df['converted']
-df['funnel_stage'] = pd.Categorical(df['funnel_stage'],
-    categories=['Bounced', 'Browsed', 'Engaged', 'Deep Engagement'],
-    ordered=True
-)
+# Load the pre-aggregated session cube and its per-dimension inverted index
+# (both shared and built once per file version)
+FILTER_DIMS = ['devicecategory', 'country', 'source']
+cube = load_cube(CUBE_STORE)
+index = load_filter_index(CUBE_STORE, FILTER_DIMS)
 
 # Sidebar filters
 st.sidebar.title("Filters")
-device_filter = st.sidebar.multiselect("Device", options=df['devicecategory'].unique(), default=df['devicecategory'].unique())
-country_filter = st.sidebar.multiselect("Country", options=df['country'].unique(), default=df['country'].unique())
-source_filter = st.sidebar.multiselect("Traffic Source", options=df['source'].unique(), default=df['source'].unique())
-
-# Apply filters
-filtered = df[
-    (df['devicecategory'].isin(device_filter)) &
-    (df['country'].isin(country_filter)) &
-    (df['source'].isin(source_filter))
-]
+devices = index.values('devicecategory')
+countries = index.values('country')
+sources = index.values('source')
+device_filter = st.sidebar.multiselect("Device", options=devices, default=devices)
+country_filter = st.sidebar.multiselect("Country", options=countries, default=countries)
+source_filter = st.sidebar.multiselect("Traffic Source", options=sources, default=sources)
+
+# Apply filters: resolve the selection through the index, then aggregate only the selected rows
+filtered = select(cube, {
+    'devicecategory': device_filter,
+    'country': country_filter,
+    'source': source_filter,
+}, index)
 
 # === KPI Cards ===
 st.markdown("## Silent Leak Detector", unsafe_allow_html=True)
 st.markdown("### Find out where attention goes to waste.", unsafe_allow_html=True)
 
-total_sessions = int(filtered.shape[0])
-total_conversions = int(filtered['converted'].sum())
+totals = total(filtered)
+total_sessions = int(totals['sessions'])
+total_conversions = int(totals['conversions'])
 overall_rate = round((total_conversions / total_sessions) * 100, 2) if total_sessions > 0 else 0
 
 st.markdown("### Conversion Overview")
@@ -84,37 +70,36 @@ st.markdown("---")
 
 # === Funnel Stage Summary ===
 st.markdown("## Funnel Stage Summary")
-funnel_summary = filtered.groupby('funnel_stage')['converted'].agg(['count', 'sum', 'mean']).rename(columns={
-    'count': 'Sessions',
-    'sum': 'Conversions',
-    'mean': 'Conversion Rate'
-})
-funnel_summary['Conversion Rate'] = (funnel_summary['Conversion Rate'] * 100).round(2)
+funnel_summary = rollup(filtered, 'funnel_stage', observed=False).rename(columns={
+    'sessions': 'Sessions',
+    'conversions': 'Conversions',
+})[['Sessions', 'Conversions']]
+funnel_summary['Conversion Rate'] = (funnel_summary['Conversions'] / funnel_summary['Sessions'] * 100).round(2)
 st.dataframe(funnel_summary)
 
 st.markdown(" ")
 
 st.markdown("## Country Conversion Map")
 try:
-    st.image("outputs/country_conversion_map.png", use_container_width=True)
+    st.image(load_image("outputs/country_conversion_map.png"), use_container_width=True)
 except Exception as e:
     st.warning("Country conversion map not found.")
 
 st.markdown("## Funnel Dropoff by Device")
 try:
-    st.image("outputs/funnel_dropoff_by_device.png", use_container_width=True)
+    st.image(load_image("outputs/funnel_dropoff_by_device.png"), use_container_width=True)
 except Exception as e:
     st.warning("Funnel waterfall chart not found.")
 
 st.markdown("## Session Duration vs Conversion")
 try:
-    st.image("outputs/session_duration_vs_conversion.png", use_container_width=True)
+    st.image(load_image("outputs/session_duration_vs_conversion.png"), use_container_width=True)
 except Exception as e:
     st.warning("Session duration correlation chart not found.")
 
 st.markdown("## Source × Device Heatmap")
 try:
-    st.image("outputs/source_device_heatmap.png", use_container_width=True)
+    st.image(load_image("outputs/source_device_heatmap.png"), use_container_width=True)
 except Exception as e:
     st.warning("Source × Device heatmap not found.")
 
@@ -123,15 +108,11 @@ st.markdown("---")
 
 # === Leak Scorecard ===
 st.markdown("## Leak Scorecard")
-scorecard = filtered.groupby(['devicecategory', 'funnel_stage']).agg(
-    sessions=('converted', 'count'),
-    conversions=('converted', 'sum'),
-    conversion_rate=('converted', 'mean')
-).reset_index()
-scorecard['conversion_rate'] = (scorecard['conversion_rate'] * 100).round(2)
+scorecard = rollup(filtered, ['devicecategory', 'funnel_stage'], observed=False)[['sessions', 'conversions']].reset_index()
+scorecard['conversion_rate'] = (scorecard['conversions'] / scorecard['sessions'] * 100).round(2)
 
 leaks = scorecard[
-    (scorecard['funnel_stage'].isin(['Engaged', 'Deep Engagement'])) &
+    (scorecard['funnel_stage'].isin(ENGAGED_STAGES)) &
     (scorecard['conversion_rate'] < 1.0)
 ].sort_values(by='sessions', ascending=False)
 
@@ -0,0 +1,59 @@
+"""Benchmark: sharded aggregation vs. a pandas group-by on the cube dimensions.
+
+Tiles the cleaned sessions to --rows (each copy gets new visitor ids, so the
+visitor-hash shards stay balanced) and aggregates sessions, conversions,
+revenue and distinct visitors over the cube's dimensions with pandas and
+with ``scripts.aggregate`` in-process and over --workers processes, under
+both partitionings. Checks every result matches pandas.
+
+Run from the repo root:  python -m benchmarks.bench_aggregate --rows 10000000 --workers 4
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from scripts.aggregate import SESSION_MEASURES, aggregate
+from scripts.cube import DIMENSIONS, SESSION_COLUMNS, duration_buckets
+from scripts.session_store import CLEANED_STORE, read_sessions
+
+MEASURES = {**SESSION_MEASURES, "visitors": ("fullvisitorid", "nunique")}
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    sessions = read_sessions(CLEANED_STORE, columns=SESSION_COLUMNS + ["fullvisitorid"])
+    copies = -(-args.rows // len(sessions))
+    copy = np.repeat(np.arange(copies, dtype=np.uint64), len(sessions))[:args.rows]
+    sessions = pd.concat([sessions] * copies, ignore_index=True).iloc[:args.rows]
+    sessions["fullvisitorid"] ^= copy << np.uint64(48)
+    sessions["duration_bucket"] = duration_buckets(sessions["timeonsite"])
+
+    expected, t_pandas = timed(lambda: sessions.groupby(DIMENSIONS, observed=True, dropna=False).agg(**MEASURES))
+    print(f"{'rows:':34s} {args.rows:,} ({len(expected):,} groups)")
+    print(f"{'pandas groupby:':34s} {t_pandas:8.3f} s")
+
+    runs = [("in-process", 1, "fullvisitorid"), ("fullvisitorid shards", args.workers, "fullvisitorid")]
+    if args.workers > 1:
+        runs.append(("date shards", args.workers, "date"))
+    for label, workers, partition in runs:
+        # visitors can't be summed across date shards unless date is a group key (it is here)
+        result, seconds = timed(aggregate, sessions, DIMENSIONS, MEASURES, dropna=False,
+                                workers=workers, partition=partition)
+        pd.testing.assert_frame_equal(result, expected, check_dtype=False, check_categorical=False, rtol=1e-12)
+        print(f"{label + f' ({workers} workers):':34s} {seconds:8.3f} s   {t_pandas / seconds:5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
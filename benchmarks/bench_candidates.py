@@ -0,0 +1,81 @@
+"""Benchmark: ranked candidate index vs. filtering and sorting the scored sessions per request
+(top N, top %, and one table page sorted by another column).
+
+Run from the repo root:  python -m benchmarks.bench_candidates --rows 10000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_filter_index import skewed_categorical, timed
+from scripts.candidates import PAGE_SIZE, CandidateIndex
+
+
+def above(df, cutoff):
+    return df[df["p_conversion"].to_numpy() > cutoff]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--top", type=int, default=500, help="N for the top-N queries")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    scored = pd.DataFrame({
+        "devicecategory": pd.Categorical.from_codes(
+            rng.choice(3, size=args.rows, p=[0.6, 0.35, 0.05]).astype(np.int8),
+            ["desktop", "mobile", "tablet"]),
+        "country": skewed_categorical(rng, args.rows, 200, "country_"),
+        "source": skewed_categorical(rng, args.rows, 300, "source_"),
+        "p_conversion": rng.beta(0.3, 20, size=args.rows).astype(np.float32),
+    })
+
+    start = time.perf_counter()
+    index = CandidateIndex(scored, labels={})
+    print(f"rows: {args.rows:,}   index build: {time.perf_counter() - start:.2f} s (once per predictions file)")
+
+    everything = {dim: index.values(dim) for dim in ["devicecategory", "country", "source"]}
+    scenarios = {
+        "all selected": everything,
+        "desktop only": {**everything, "devicecategory": ["desktop"]},
+        "mobile, 5 countries, 10 sources": {
+            "devicecategory": ["mobile"],
+            "country": [f"country_{i}" for i in range(5)],
+            "source": [f"source_{i}" for i in range(10)],
+        },
+        "tablet, 1 tail source": {**everything, "devicecategory": ["tablet"], "source": ["source_250"]},
+    }
+    cutoff = scored["p_conversion"].quantile(0.9)
+
+    print(f"{'scenario':34} {'query':>8} {'rows':>10} {'mask + sort':>12} {'index':>10}")
+    for name, filters in scenarios.items():
+        def matching():
+            mask = np.ones(len(scored), dtype=bool)
+            for dim, values in filters.items():
+                mask &= scored[dim].isin(values).to_numpy()
+            return scored[mask]
+
+        queries = {
+            f"top {args.top}": (lambda: matching().nlargest(args.top, "p_conversion", keep="first"),
+                                lambda: index.top(filters, n=args.top)),
+            "top 10%": (lambda: above(matching(), cutoff).sort_values("p_conversion", ascending=False),
+                        lambda: index.top(filters, pct=10)),
+            # first table page of the top 10%, sorted by country
+            "page": (lambda: above(matching(), cutoff).sort_values("country", kind="stable").head(PAGE_SIZE),
+                     lambda: index.page(index.ranks(filters, pct=10), 0, PAGE_SIZE, by="country")),
+        }
+        for query, (baseline, indexed) in queries.items():
+            expected, t_base = timed(baseline, repeat=3)
+            got, t_index = timed(indexed, repeat=3)
+            if query == f"top {args.top}":  # the % cut is by rank, the baseline by score: ties may differ
+                assert np.array_equal(np.sort(got["p_conversion"].to_numpy()),
+                                      np.sort(expected["p_conversion"].to_numpy())), (name, query)
+            print(f"{name:34} {query:>8} {len(got):>10,} {t_base * 1000:>10.1f}ms {t_index * 1000:>8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
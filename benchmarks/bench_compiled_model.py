@@ -0,0 +1,82 @@
+"""Benchmark: compiled NumPy scorer vs. the sklearn/xgboost pipeline.
+
+Checks parity of the compiled model against the pipeline's predict_proba on
+the engineered sessions (tiled to --rows), then compares batch throughput and
+cold start (fresh interpreter: import, load the model, score one session).
+
+Run from the repo root:  python -m benchmarks.bench_compiled_model --rows 1000000
+"""
+import argparse
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from scripts.compiled_model import COMPILED_MODEL_PATH
+from scripts.model_artifact import FEATURES, MODEL_PATH, load_artifact, model_frame, predict_proba
+from scripts.session_store import ENGINEERED_STORE, read_sessions
+
+COLD_START = """
+import time
+start = time.perf_counter()
+import sys
+import pandas as pd
+from scripts.model_artifact import load_artifact, model_frame, predict_proba
+artifact = load_artifact({path!r})
+session = pd.DataFrame([{{"devicecategory": "desktop", "source": "google", "country": "Canada",
+                          "session_bin": "5–20m", "device_source_combo": "desktop_google",
+                          "pageviews": 7.0, "timeonsite": 312.0, "is_bounce": 0,
+                          "pageviews_per_minute": 1.35, "high_value_region": 1}}])
+predict_proba(artifact, model_frame(session, artifact))
+heavy = sorted({{m.split(".")[0] for m in sys.modules}} & {{"sklearn", "xgboost"}})
+print(time.perf_counter() - start, ",".join(heavy) or "-")
+"""
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def cold_start(path, repeats):
+    runs = [subprocess.run([sys.executable, "-c", COLD_START.format(path=path)],
+                           capture_output=True, text=True, check=True).stdout.split()
+            for _ in range(repeats)]
+    return min(float(seconds) for seconds, _ in runs), runs[0][1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--compiled', default=COMPILED_MODEL_PATH)
+    parser.add_argument('--cold-repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    pipeline, compiled = load_artifact(args.model), load_artifact(args.compiled)
+    sessions = read_sessions(ENGINEERED_STORE, columns=FEATURES)
+    sessions = pd.concat([sessions] * -(-args.rows // len(sessions)), ignore_index=True).iloc[:args.rows]
+
+    expected, t_pipeline = timed(lambda: predict_proba(pipeline, model_frame(sessions, pipeline)))
+    actual, t_compiled = timed(lambda: predict_proba(compiled, model_frame(sessions, compiled)))
+    max_diff = np.abs(expected.astype(np.float64) - actual).max()
+    flips = ((expected >= pipeline["threshold"]) != (actual >= compiled["threshold"])).sum()
+    assert max_diff < 1e-5, f"compiled scores differ from the pipeline by {max_diff:.2e}"
+
+    cold_pipeline, heavy_pipeline = cold_start(args.model, args.cold_repeats)
+    cold_compiled, heavy_compiled = cold_start(args.compiled, args.cold_repeats)
+
+    print(f"rows:             {args.rows:,}")
+    print(f"max |diff|:       {max_diff:.2e}   ({flips} threshold decisions differ)")
+    print(f"pipeline:         {t_pipeline:8.3f} s   {args.rows / t_pipeline:12,.0f} rows/s")
+    print(f"compiled:         {t_compiled:8.3f} s   {args.rows / t_compiled:12,.0f} rows/s")
+    print(f"speedup:          {t_pipeline / t_compiled:8.1f}x")
+    print(f"cold start:       pipeline {cold_pipeline:.2f} s (imports {heavy_pipeline}), "
+          f"compiled {cold_compiled:.2f} s (imports {heavy_compiled})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Benchmark: vectorized feature engineering vs. the string-based derivation.
+
+Tiles the cleaned sessions to --rows and derives the model features both
+ways: the old derivation (``pd.cut``, ``device + "_" + source`` string
+concatenation, ``isin`` on country strings) and ``scripts.features``
+(searchsorted bins, device × source from category codes, a per-category
+high-value lookup). Checks the results agree and reports time and the
+memory of the device_source_combo column.
+
+Run from the repo root:  python -m benchmarks.bench_features --rows 10000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from scripts.features import (
+    BOUNCE_SECONDS, RAW_FIELDS, SESSION_BIN_EDGES, SESSION_BIN_LABELS, add_features,
+    high_value_countries,
+)
+from scripts.session_store import CLEANED_STORE, read_sessions
+
+
+# The derivation the notebook and the first features module used
+def add_features_strings(sessions, high_value):
+    timeonsite = sessions["timeonsite"]
+    return sessions.assign(
+        is_bounce=(timeonsite < BOUNCE_SECONDS).astype("int8"),
+        session_bin=pd.cut(timeonsite, SESSION_BIN_EDGES, labels=SESSION_BIN_LABELS),
+        pageviews_per_minute=sessions["pageviews"] / (timeonsite / 60 + 1e-6),
+        device_source_combo=sessions["devicecategory"].astype(str) + "_" + sessions["source"].astype(str),
+        high_value_region=sessions["country"].isin(high_value).astype("int8"),
+    )
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    args = parser.parse_args()
+
+    sessions = read_sessions(CLEANED_STORE, columns=RAW_FIELDS + ["converted"])
+    high_value = high_value_countries(sessions)
+    sessions = pd.concat([sessions] * -(-args.rows // len(sessions)), ignore_index=True).iloc[:args.rows]
+
+    old, t_old = timed(add_features_strings, sessions, high_value)
+    new, t_new = timed(add_features, sessions, high_value)
+
+    for col in ["is_bounce", "session_bin", "pageviews_per_minute", "high_value_region"]:
+        assert old[col].equals(new[col].astype(old[col].dtype)), f"{col} differs"
+    combo = new["device_source_combo"]
+    assert (np.asarray(combo.cat.categories)[combo.cat.codes] == old["device_source_combo"].to_numpy()).all(), \
+        "device_source_combo differs"
+
+    mb_old = old["device_source_combo"].memory_usage(deep=True) / 2**20
+    mb_new = combo.memory_usage(deep=True) / 2**20
+    print(f"rows:                 {args.rows:,}")
+    print(f"string derivation:    {t_old:8.3f} s")
+    print(f"vectorized:           {t_new:8.3f} s")
+    print(f"speedup:              {t_old / t_new:8.1f}x")
+    print(f"device_source_combo:  {mb_old:8.1f} MB as strings, {mb_new:.1f} MB as categorical "
+          f"({len(combo.cat.categories)} categories)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Benchmark: index-backed sidebar filtering vs. chained isin masks.
+
+Run from the repo root:  python -m benchmarks.bench_filter_index --rows 50000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from scripts.filter_index import FilterIndex
+
+
+def skewed_categorical(rng, rows, n_values, prefix):
+    # Zipf-like traffic: a few countries/sources carry most of the sessions
+    weights = 1 / np.arange(1, n_values + 1)
+    codes = rng.choice(n_values, size=rows, p=weights / weights.sum()).astype(np.int16)
+    return pd.Categorical.from_codes(codes, [f"{prefix}{i}" for i in range(n_values)])
+
+
+def timed(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    df = pd.DataFrame({
+        "devicecategory": pd.Categorical.from_codes(
+            rng.choice(3, size=args.rows, p=[0.6, 0.35, 0.05]).astype(np.int8),
+            ["desktop", "mobile", "tablet"]),
+        "country": skewed_categorical(rng, args.rows, 200, "country_"),
+        "source": skewed_categorical(rng, args.rows, 300, "source_"),
+        "converted": (rng.random(args.rows) < 0.01).astype(np.int8),
+    })
+    dims = ["devicecategory", "country", "source"]
+
+    start = time.perf_counter()
+    index = FilterIndex(df, dims)
+    print(f"rows: {args.rows:,}   index build: {time.perf_counter() - start:.2f} s (once per dataset version)")
+
+    everything = {dim: index.values(dim) for dim in dims}
+    scenarios = {
+        "all selected": everything,
+        "desktop only": {**everything, "devicecategory": ["desktop"]},
+        "top country": {**everything, "country": ["country_0"]},
+        "mobile, 5 countries, 10 sources": {
+            "devicecategory": ["mobile"],
+            "country": [f"country_{i}" for i in range(5)],
+            "source": [f"source_{i}" for i in range(10)],
+        },
+        "tablet, 1 tail source": {**everything, "devicecategory": ["tablet"], "source": ["source_250"]},
+    }
+
+    print(f"{'scenario':34} {'rows':>12} {'isin masks':>12} {'index':>10}")
+    for name, filters in scenarios.items():
+        def with_masks():
+            mask = np.ones(len(df), dtype=bool)
+            for dim, values in filters.items():
+                mask &= df[dim].isin(values).to_numpy()
+            return int(df["converted"].to_numpy()[mask].sum())
+
+        def with_index():
+            rows = index.select(filters)
+            converted = df["converted"].to_numpy()
+            return int(converted.sum() if rows is None else converted[rows].sum())
+
+        expected, t_mask = timed(with_masks)
+        got, t_index = timed(with_index)
+        assert got == expected, name
+        selected = index.select(filters)
+        n = len(df) if selected is None else len(selected)
+        print(f"{name:34} {n:>12,} {t_mask * 1000:>10.1f}ms {t_index * 1000:>8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Benchmark: vectorized funnel-stage binning vs. the old per-row apply.
+
+Run from the repo root:  python -m benchmarks.bench_funnel_stage --rows 10000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from scripts.funnel import classify_stages
+
+
+# The per-row classifier that clean_data.py used before vectorization
+def classify_stage(pv):
+    if pv == 0:
+        return "Bounced"
+    elif pv < 5:
+        return "Browsed"
+    elif pv < 10:
+        return "Engaged"
+    else:
+        return "Deep Engagement"
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    # Pageviews shaped like the GA export: mostly 0–4, long tail, a few missing
+    rng = np.random.default_rng(args.seed)
+    pageviews = pd.Series(rng.geometric(0.25, args.rows) - 1, dtype=float)
+    pageviews[rng.random(args.rows) < 0.001] = np.nan
+
+    old, t_apply = timed(lambda s: s.apply(classify_stage), pageviews)
+    new, t_vec = timed(classify_stages, pageviews)
+
+    assert (new.astype(object) == old).all(), "vectorized labels differ from apply"
+    print(f"rows:        {args.rows:,}")
+    print(f"apply:       {t_apply:8.3f} s")
+    print(f"vectorized:  {t_vec:8.3f} s")
+    print(f"speedup:     {t_apply / t_vec:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""Benchmark: request latency of the online scoring service under concurrent load.
+
+Starts ``scripts.scoring_service`` in a subprocess (or targets --url), then
+drives it from keep-alive connections, each sending single-session requests
+back to back, and reports latency percentiles against the service targets.
+
+Run from the repo root:  python -m benchmarks.bench_scoring_service --concurrency 32 --requests 5000
+"""
+import argparse
+import asyncio
+import json
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from scripts.features import RAW_FIELDS
+from scripts.scoring_service import P50_TARGET_MS, P99_TARGET_MS
+from scripts.session_store import ENGINEERED_STORE, read_sessions
+
+
+def sample_sessions(n, seed):
+    sessions = read_sessions(ENGINEERED_STORE, columns=RAW_FIELDS).sample(n, replace=True, random_state=seed)
+    return [
+        {**row, "devicecategory": str(row["devicecategory"]), "source": str(row["source"]),
+         "country": str(row["country"])}
+        for row in sessions.to_dict("records")
+    ]
+
+
+async def request(reader, writer, host, method, path, body=b""):
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def client(host, port, bodies, latencies):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for body in bodies:
+            start = time.perf_counter()
+            status, _ = await request(reader, writer, host, "POST", "/score", body)
+            latencies.append(time.perf_counter() - start)
+            assert status == 200, f"service answered {status}"
+    finally:
+        writer.close()
+
+
+async def get_health(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        return (await request(reader, writer, host, "GET", "/health"))[1]
+    finally:
+        writer.close()
+
+
+async def wait_until_up(host, port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return await get_health(host, port)
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.2)
+
+
+async def run_load(host, port, sessions, concurrency):
+    bodies = [json.dumps(session).encode() for session in sessions]
+    await wait_until_up(host, port)
+    # Warm up (first model call, allocator) before measuring
+    await asyncio.gather(*(client(host, port, bodies[:5], []) for _ in range(concurrency)))
+    before = await get_health(host, port)
+
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(host, port, bodies[i::concurrency], latencies) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    after = await get_health(host, port)
+    batches = after["batches"] - before["batches"]
+    return np.array(latencies) * 1000, elapsed, (after["sessions"] - before["sessions"]) / max(batches, 1)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', default=None, help="benchmark a running service instead of starting one")
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--model', default=None, help="model artifact for the started service (.joblib or .npz)")
+    parser.add_argument('--max-wait-ms', type=float, default=None, help="passed to the started service")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    service = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port
+    else:
+        host, port = "127.0.0.1", free_port()
+        command = [sys.executable, "-m", "scripts.scoring_service", "--port", str(port)]
+        if args.model is not None:
+            command += ["--model", args.model]
+        if args.max_wait_ms is not None:
+            command += ["--max-wait-ms", str(args.max_wait_ms)]
+        service = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    try:
+        sessions = sample_sessions(args.requests, args.seed)
+        latencies, elapsed, batch_size = asyncio.run(run_load(host, port, sessions, args.concurrency))
+    finally:
+        if service is not None:
+            service.terminate()
+            service.wait()
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    print(f"requests:     {len(latencies):,} from {args.concurrency} concurrent clients")
+    print(f"throughput:   {len(latencies) / elapsed:8.0f} req/s")
+    print(f"batch size:   {batch_size:8.1f} sessions per model call")
+    print(f"p50:          {p50:8.2f} ms   (target {P50_TARGET_MS} ms: {'ok' if p50 <= P50_TARGET_MS else 'MISSED'})")
+    print(f"p95:          {p95:8.2f} ms")
+    print(f"p99:          {p99:8.2f} ms   (target {P99_TARGET_MS} ms: {'ok' if p99 <= P99_TARGET_MS else 'MISSED'})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Benchmark: cold start of the Streamlit app, per page.
+
+Each page (and the Homepage) runs in a fresh interpreter through Streamlit's
+``AppTest`` harness, as the server runs it on first open: time to import
+Streamlit itself (paid once per server), time to the first complete render
+(the page's imports, data loads and figures), and a rerun (what every later
+interaction costs). Also lists the heavy plotting/ML libraries the page
+pulled in. Takes the best of --repeats fresh processes.
+
+Run from the repo root:  python -m benchmarks.bench_startup
+"""
+import argparse
+import glob
+import json
+import subprocess
+import sys
+
+SCRIPTS = ["Homepage.py"] + sorted(glob.glob("pages/*.py"))
+HEAVY = ["matplotlib", "seaborn", "plotly", "pycountry", "sklearn", "xgboost", "shap", "duckdb"]
+
+COLD_START = """
+import json
+import sys
+import time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+app = AppTest.from_file({script!r}, default_timeout=300).run()
+first = time.perf_counter()
+app.run()
+rerun = time.perf_counter()
+assert not app.exception, [e.message for e in app.exception]
+heavy = sorted({{m.split(".")[0] for m in sys.modules}} & set({heavy!r}))
+print(json.dumps([imported - start, first - imported, rerun - first, heavy]))
+"""
+
+
+def cold_start(script, repeats):
+    runs = [json.loads(subprocess.run([sys.executable, "-c", COLD_START.format(script=script, heavy=HEAVY)],
+                                      capture_output=True, text=True, check=True).stdout.splitlines()[-1])
+            for _ in range(repeats)]
+    return [min(run[i] for run in runs) for i in range(3)] + [runs[0][3]]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('scripts', nargs='*', default=SCRIPTS, help="page scripts (default: every page)")
+    args = parser.parse_args()
+
+    print(f"{'page':40s} {'streamlit':>10s} {'first render':>13s} {'rerun':>8s}   heavy imports")
+    for script in args.scripts:
+        streamlit, first, rerun, heavy = cold_start(script, args.repeats)
+        print(f"{script:40s} {streamlit:9.2f}s {first:12.2f}s {rerun:7.2f}s   {', '.join(heavy) or '-'}")
+
+
+if __name__ == '__main__':
+    main()
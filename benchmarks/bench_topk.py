@@ -0,0 +1,79 @@
+"""Benchmark: top-k / decile selection vs. sorting every score.
+
+In memory: ``topk.top_k`` against ``np.argsort`` and ``DataFrame.nlargest``,
+and ``topk.decile_table`` against sort_values + groupby by rank bucket. Streaming:
+``topk.Ranking`` fed the same scores in scoring-sized batches, against
+concatenating the batches and sorting. Checks the top k matches nlargest and
+reports how far the histogram deciles' conversions are from the exact ones.
+
+Run from the repo root:  python -m benchmarks.bench_topk --rows 10000000
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_filter_index import timed
+from scripts.score import BATCH_SIZE
+from scripts.topk import Ranking, decile_table, top_k
+
+
+def sorted_deciles(scores, converted):
+    df = pd.DataFrame({"y_true": converted, "y_score": scores}).sort_values("y_score", ascending=False)
+    df = df.reset_index(drop=True)
+    df["bucket"] = df.index * 10 // len(df)
+    return df.groupby("bucket")["y_true"].agg(["sum", "count"])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--pct", type=float, default=10, help="top PCT %% of the scores")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    scores = rng.beta(0.3, 20, size=args.rows).astype(np.float32)
+    converted = (rng.random(args.rows) < scores * 3).astype(np.int8)
+    scored = pd.DataFrame({"p_conversion": scores, "converted": converted})
+    k = int(args.pct / 100 * args.rows)
+    print(f"rows: {args.rows:,}   k: {k:,}")
+
+    expected, t_nlargest = timed(lambda: scored.nlargest(k, "p_conversion"), repeat=3)
+    _, t_argsort = timed(lambda: np.argsort(scores)[-k:], repeat=3)
+    got, t_top = timed(lambda: top_k(scores, k), repeat=3)
+    assert np.array_equal(got, expected.index.to_numpy())
+    print(f"top k        argsort {t_argsort * 1000:8.1f}ms   nlargest {t_nlargest * 1000:8.1f}ms   "
+          f"top_k {t_top * 1000:8.1f}ms")
+
+    exact, t_sorted = timed(lambda: sorted_deciles(scores, converted), repeat=3)
+    table, t_deciles = timed(lambda: decile_table(scores, converted), repeat=3)
+    assert np.array_equal(table["conversions"], exact["sum"]) and np.array_equal(table["total"], exact["count"])
+    print(f"deciles      sort + groupby {t_sorted * 1000:8.1f}ms   decile_table {t_deciles * 1000:8.1f}ms")
+
+    batches = [scored.iloc[i:i + args.batch_size] for i in range(0, args.rows, args.batch_size)]
+
+    def streamed():
+        ranking = Ranking(k)
+        for batch in batches:
+            ranking.add(batch)
+        return ranking
+
+    def collected():
+        everything = pd.concat(batches, ignore_index=True)
+        top = everything.nlargest(k, "p_conversion")
+        return top, sorted_deciles(everything["p_conversion"], everything["converted"])
+
+    _, t_collected = timed(collected, repeat=3)
+    ranking, t_streamed = timed(streamed, repeat=3)
+    assert np.array_equal(ranking.top()["p_conversion"], expected["p_conversion"])
+    streamed_table = ranking.deciles()
+    assert np.array_equal(streamed_table["total"], exact["count"])
+    error = np.abs(streamed_table["conversions"].to_numpy() - exact["sum"].to_numpy()) / exact["sum"].clip(lower=1)
+    print(f"streamed     concat + sort {t_collected * 1000:8.1f}ms   Ranking {t_streamed * 1000:8.1f}ms   "
+          f"(batches of {args.batch_size:,}; decile conversions within {error.max():.2%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,36 @@
+import os
+import tempfile
+
 import streamlit as st
-import pandas as pd
 import plotly.express as px
 
+from scripts.data_access import file_version, load_candidates, load_frame, load_model
+from scripts.model_artifact import MODEL_PATH
+from scripts.session_store import SCORED_STORE
+
 # ── Theme Settings ────────────────────────────────────────
 PAPER = "#2E2E2E"
 FONT  = dict(family="Helvetica Neue Bold", color="#ffffff", size=14)
 
 st.set_page_config(page_title="Top Conversion Candidates", layout="wide")
 
+
+# ── Cached model and explanations ─────────────────────────
+# Keyed on the model file's version, so a retrained model is reloaded
+@st.cache_resource(max_entries=1)
+def conversion_model(model_version):
+    return load_model(MODEL_PATH)
+
+
+# Reruns (filters, paging, exports) reuse a session's explanation; session is
+# its position in the scored store, so the store's version is part of the key
+@st.cache_data(max_entries=256)
+def session_contributions(session, model_version, store_version):
+    from scripts.explain import explain_sessions
+
+    return explain_sessions(load_candidates().model_rows([session]), conversion_model(model_version))
+
+
 # Top Conversion Candidates Title
 st.title("Top Conversion Candidates")
 
@@ -71,28 +94,15 @@ This page leverages a **gradient-boosted decision tree** model (XGBoost) trained
 """)
 st.markdown("---")
 
-@st.cache_data
-def load_data():
-    return pd.read_csv("outputs/top_10pct_sessions.csv")
-
-
-df = load_data()
-
-# Friendly source labels
-label_map = {
-    "facebook.com": "Facebook",
-    "(direct)": "Direct Traffic",
-    "google": "Google",
-    "youtube.com": "YouTube",
-    "analytics.google.com": "Google Analytics"
-}
-df["source"] = df["source"].map(lambda x: label_map.get(x, x))
+# Every scored session, ranked by p_conversion with per-dimension indexes
+# (built once per predictions file; friendly source labels are a category rename)
+candidates = load_candidates()
 
 # ── Interactive Filters ────────────────────────────────────────
 st.markdown("### Filter Sessions")
-devices = df["devicecategory"].unique().tolist()
-sources = df["source"].unique().tolist()
-countries = df["country"].unique().tolist()
+devices = candidates.values("devicecategory")
+sources = candidates.values("source")
+countries = candidates.values("country")
 
 device_filter = st.multiselect(
     "Device Type", options=devices, default=devices, label_visibility="collapsed"
@@ -104,34 +114,73 @@ country_filter = st.multiselect(
     "Country", options=countries, default=countries, label_visibility="collapsed"
 )
 
-# Apply filters
-df = df[
-    df["devicecategory"].isin(device_filter) &
-    df["source"].isin(source_filter) &
-    df["country"].isin(country_filter)
-]
+# Either the top share of all scored sessions or a fixed number, under the filters
+cut = st.radio("Candidates", ["Top %", "Top N"], horizontal=True, label_visibility="collapsed")
+if cut == "Top %":
+    pct, n = st.slider("Top % of scored sessions", min_value=1, max_value=100, value=10), None
+else:
+    pct, n = None, st.number_input("Number of sessions", min_value=1, value=200, step=50)
+
+# Apply filters: matching ranks come back best first, so no sorting is needed
+ranks = candidates.ranks({
+    "devicecategory": device_filter,
+    "source": source_filter,
+    "country": country_filter,
+}, n=n, pct=pct)
+# The whole selection, only the columns the summaries below need
+df = candidates.frame[["devicecategory", "source", "country", "p_conversion"]].take(ranks)
 st.markdown("---")
 
 
 
 st.subheader("Top Sessions by Predicted Conversion Probability")
-st.dataframe(
-    df[["devicecategory", "source", "country", "session_bin", "p_conversion"]]
-    .sort_values(by="p_conversion", ascending=False),
-    use_container_width=True,
-)
-
-csv = df.to_csv(index=False).encode("utf-8")
-st.download_button(
-    label="Download Top 10% Sessions as CSV",
-    data=csv,
-    file_name="top_10pct_sessions.csv",
-    mime="text/csv",
+# Sorted and paged on the server: only the visible rows are sent to the browser
+TABLE_COLUMNS = ["devicecategory", "source", "country", "session_bin", "p_conversion"]
+sort_col, order_col, size_col, page_col = st.columns(4)
+sort_by = sort_col.selectbox("Sort by", TABLE_COLUMNS, index=TABLE_COLUMNS.index("p_conversion"))
+descending = order_col.radio("Order", ["Descending", "Ascending"], horizontal=True) == "Descending"
+page_size = size_col.selectbox("Rows per page", [25, 50, 100, 250], index=1)
+page_count = max(1, -(-len(ranks) // page_size))
+page_number = page_col.number_input(f"Page (of {page_count:,})", min_value=1, max_value=page_count, value=1)
+start = (page_number - 1) * page_size
+page = candidates.page(ranks, start, page_size, by=sort_by, ascending=not descending)
+st.dataframe(page[TABLE_COLUMNS], use_container_width=True)
+st.caption(f"Sessions {min(start + 1, len(ranks)):,}–{start + len(page):,} of {len(ranks):,}")
+
+# The export is only built when asked for, chunk by chunk, into a temporary file
+def export_controls(ranks, selection, export_format):
+    # The file deletes itself when closed: on a new export or selection change,
+    # or once the session's state is dropped. Only the session state holds it
+    # (not the page's globals, which outlive the run)
+    extension = export_format.lower()
+    export = st.session_state.get("candidate_export")
+    prepare = st.button(f"Prepare {export_format} export ({len(ranks):,} sessions)")
+    if export is not None and (prepare or export[0] != selection):
+        export[1].close()
+        export = st.session_state["candidate_export"] = None
+    if prepare:
+        out = tempfile.NamedTemporaryFile(prefix="candidates-", suffix=f".{extension}")
+        candidates.export(ranks, out, extension)
+        out.flush()
+        export = st.session_state["candidate_export"] = (selection, out)
+    if export is not None:
+        with open(export[1].name, "rb") as f:
+            st.download_button(
+                label=f"Download Candidate Sessions as {export_format}",
+                data=f,
+                file_name=f"conversion_candidates.{extension}",
+                mime="text/csv" if extension == "csv" else "application/octet-stream",
+            )
+
+
+export_format = st.radio("Export format", ["CSV", "Parquet"], horizontal=True)
+export_controls(
+    ranks, (tuple(device_filter), tuple(source_filter), tuple(country_filter), pct, n, export_format), export_format,
 )
 
 # ── Key Insight Annotation ───────────────────────────────
 # Determine the top-performing source overall from filtered data
-avg_source = df.groupby("source")["p_conversion"].mean()
+avg_source = df.groupby("source", observed=True)["p_conversion"].mean()
 top_source = avg_source.idxmax()
 top_value = avg_source.max()
 st.markdown(
@@ -141,17 +190,18 @@ st.markdown(
 st.markdown("---")
 st.subheader("Top Sources by Average Conversion Likelihood")
 
-df["devicecategory"] = df["devicecategory"].str.title()
+# Group by label strings so sources keep their alphabetical order in the chart
+df = df.assign(source=df["source"].astype(str), devicecategory=df["devicecategory"].str.title())
 
 source_device_summary = (
-    df.groupby(["source", "devicecategory"])["p_conversion"]
+    df.groupby(["source", "devicecategory"], observed=True)["p_conversion"]
     .mean()
     .reset_index()
 )
 
 # Keep only top 10 sources by overall mean probability
 top_sources = (
-    source_device_summary.groupby("source")["p_conversion"]
+    source_device_summary.groupby("source", observed=True)["p_conversion"]
     .mean()
     .sort_values(ascending=False)
     .head(10)
@@ -207,6 +257,61 @@ fig.update_layout(
 
 st.plotly_chart(fig, use_container_width=True)
 
+# ── Why These Sessions Score High ─────────────────────────
+st.markdown("---")
+st.subheader("What Drives the Score")
+importance_path = "outputs/shap_importance.csv"
+if os.path.exists(importance_path):
+    # Mean |SHAP| per feature, written by `python -m scripts.explain`
+    importance = (
+        load_frame(importance_path)
+        .groupby("raw_feature")["mean_abs_shap"].sum()
+        .sort_values()
+        .reset_index()
+    )
+    fig_importance = px.bar(
+        importance, x="mean_abs_shap", y="raw_feature", orientation="h",
+        color_discrete_sequence=["#00E5FF"], text_auto=".2f",
+    )
+    fig_importance.update_layout(
+        plot_bgcolor=PAPER,
+        paper_bgcolor=PAPER,
+        font=FONT,
+        xaxis_title="Mean |SHAP| (log-odds)",
+        yaxis_title="",
+        xaxis_title_font=dict(color="#e65100", size=20),
+        margin=dict(t=30, b=40),
+    )
+    st.plotly_chart(fig_importance, use_container_width=True)
+else:
+    st.info("Run `python -m scripts.explain` to compute feature importance.")
+
+if os.path.exists(MODEL_PATH) and not df.empty:
+    session = st.selectbox(
+        "Explain a session",
+        options=page.index,  # the sessions on the current table page
+        format_func=lambda i: f"{df.at[i, 'devicecategory']} · {df.at[i, 'source']} · "
+                              f"{df.at[i, 'country']} · p={df.at[i, 'p_conversion']:.2f}",
+    )
+    contributions = session_contributions(int(session), file_version(MODEL_PATH), file_version(SCORED_STORE))
+    contributions = contributions[contributions["feature"] != "(base)"].sort_values("contribution")
+    fig_session = px.bar(
+        contributions, x="contribution", y="feature", orientation="h",
+        color=contributions["contribution"] > 0,
+        color_discrete_map={True: "#88CC00", False: "#FF4C4C"}, text_auto=".2f",
+    )
+    fig_session.update_layout(
+        plot_bgcolor=PAPER,
+        paper_bgcolor=PAPER,
+        font=FONT,
+        showlegend=False,
+        xaxis_title="SHAP contribution (log-odds)",
+        yaxis_title="",
+        xaxis_title_font=dict(color="#e65100", size=20),
+        margin=dict(t=30, b=40),
+    )
+    st.plotly_chart(fig_session, use_container_width=True)
+
 st.markdown("---")
 st.header("Example Use Cases")
 st.markdown("""
@@ -0,0 +1,192 @@
+"""Ranked index over every scored session, for the Top Conversion Candidates page.
+
+The index is built over the store ``scripts.score`` writes: every session,
+with its raw country and source and the model features. Sessions are sorted
+once by ``p_conversion`` (highest first, ties in file order), so a session's row position is its rank. A ``FilterIndex`` over the
+ranked frame resolves device/source/country filters to sorted rank lists, so
+
+* the top N sessions under a filter are the first N matching ranks, and
+* the top p% of the scored population under a filter are the matching ranks
+  below the population's p% cut-off, found by binary search,
+
+without sorting or scanning the sessions per request. Friendly labels (e.g.
+"(direct)" -> "Direct Traffic") are applied once, as a rename of the
+dimension's categories; ``model_rows`` restores the model's own values for
+explanations.
+
+A selection is served a page at a time (``page``): in rank order directly,
+or ordered by another column through a per-column sort key computed once,
+partially sorting only as many rows as the page needs. ``export`` writes a
+selection as CSV or Parquet chunk by chunk, so the selection is never
+materialised as one frame (or one CSV string).
+
+    python -m scripts.candidates --pct 10 --filter devicecategory=desktop
+    python -m scripts.candidates --pct 10 --export outputs/top_10pct_sessions.parquet
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from scripts.filter_index import FilterIndex
+from scripts.session_store import SCORED_STORE
+
+DIMENSIONS = ["devicecategory", "source", "country"]
+PAGE_SIZE = 50
+EXPORT_CHUNK = 100_000  # rows encoded per export chunk
+
+# Display labels for traffic sources; others keep their GA name
+SOURCE_LABELS = {
+    "facebook.com": "Facebook",
+    "(direct)": "Direct Traffic",
+    "google": "Google",
+    "youtube.com": "YouTube",
+    "analytics.google.com": "Google Analytics",
+}
+
+
+class CandidateIndex:
+    """Scored sessions ranked by p_conversion, with per-dimension indexes."""
+
+    def __init__(self, scored, dimensions=DIMENSIONS, labels=None):
+        labels = {"source": SOURCE_LABELS} if labels is None else labels
+        order = np.argsort(-scored["p_conversion"].to_numpy(), kind="stable")
+        frame = scored.take(order).reset_index(drop=True)
+        self._model_categories = {}
+        for dim, mapping in labels.items():
+            values = frame[dim] if isinstance(frame[dim].dtype, pd.CategoricalDtype) else frame[dim].astype("category")
+            self._model_categories[dim] = values.cat.categories
+            frame[dim] = values.cat.rename_categories(lambda value: mapping.get(value, value))
+        self.frame = frame  # ranked and labelled; treat as read-only
+        self.size = len(frame)
+        self._index = FilterIndex(frame, dimensions)
+        self._sort_keys = {}
+
+    def values(self, dim):
+        """Distinct (labelled) values of dim among the scored sessions."""
+        return self._index.values(dim)
+
+    def ranks(self, filters=None, n=None, pct=None):
+        """Sorted ranks (best first) of the sessions matching filters, cut to the
+        top pct % of all scored sessions and then to the first n."""
+        ranks = self._index.select(filters or {})
+        if pct is not None:
+            cutoff = int(pct / 100 * self.size)
+            ranks = np.arange(cutoff) if ranks is None else ranks[:np.searchsorted(ranks, cutoff)]
+        if ranks is None:
+            ranks = np.arange(self.size if n is None else min(n, self.size))
+        return ranks if n is None else ranks[:n]
+
+    def top(self, filters=None, n=None, pct=None):
+        """The sessions ranks() selects, best first."""
+        return self.frame.take(self.ranks(filters, n, pct))
+
+    # ── pages ──
+    def _sort_key(self, column):
+        # Dense rank of each row's value (labels compare as strings), missing values
+        # last; built once per column. Returns (keys, number of distinct values)
+        if column not in self._sort_keys:
+            values = self.frame[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                labels = values.cat.categories.astype(str)
+                position = np.empty(len(labels), dtype=np.int64)
+                position[np.argsort(labels, kind="stable")] = np.arange(len(labels))
+                codes = values.cat.codes.to_numpy()
+                keys = np.where(codes < 0, len(labels), position[codes])
+                distinct = len(labels)
+            else:
+                values = values.to_numpy()
+                missing = pd.isna(values)
+                distinct_values, keys = np.unique(values[~missing], return_inverse=True)
+                keys = np.insert(keys, np.flatnonzero(missing) - np.arange(missing.sum()), len(distinct_values))
+                distinct = len(distinct_values)
+            self._sort_keys[column] = (keys, distinct)
+        return self._sort_keys[column]
+
+    def page(self, ranks, start=0, size=PAGE_SIZE, by=None, ascending=True):
+        """Rows start:start + size of the sessions at ranks (best first), ordered by
+        column `by` (ties best first, missing values last) or, if None, by rank."""
+        stop = min(start + size, len(ranks))
+        if start >= stop:
+            return self.frame.iloc[:0]
+        if by == "p_conversion":
+            by, ascending = None, not ascending  # rank order is p_conversion descending
+        if by is None:
+            chosen = ranks[start:stop] if ascending else ranks[::-1][start:stop]
+            return self.frame.take(chosen)
+
+        keys, distinct = self._sort_key(by)
+        keys = keys[ranks]
+        if not ascending:
+            keys = np.where(keys < distinct, distinct - 1 - keys, keys)
+        # Ties keep rank order; only the first `stop` positions are fully sorted
+        composite = keys.astype(np.int64) * len(ranks) + np.arange(len(ranks))
+        if stop < len(composite):
+            first = np.argpartition(composite, stop - 1)[:stop]
+            order = first[np.argsort(composite[first])]
+        else:
+            order = np.argsort(composite)
+        return self.frame.take(ranks[order[start:stop]])
+
+    # ── export ──
+    def export(self, ranks, out, fmt="csv", chunksize=EXPORT_CHUNK):
+        """Write the sessions at ranks (best first) to the binary file object out
+        as CSV or Parquet, one chunk of rows at a time."""
+        if fmt == "csv":
+            for first in range(0, max(len(ranks), 1), chunksize):
+                chunk = self.frame.take(ranks[first:first + chunksize])
+                out.write(chunk.to_csv(index=False, header=first == 0).encode("utf-8"))
+            return
+        if fmt != "parquet":
+            raise ValueError(f"unknown export format {fmt!r} (expected 'csv' or 'parquet')")
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.Schema.from_pandas(self.frame, preserve_index=False)
+        with pq.ParquetWriter(out, schema) as writer:
+            for first in range(0, len(ranks), chunksize):  # one row group per chunk
+                chunk = self.frame.take(ranks[first:first + chunksize])
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+    def model_rows(self, ranks):
+        """Rows at ranks with the model's own category values (for scoring or explanations)."""
+        rows = self.frame.take(ranks)
+        return rows.assign(**{
+            dim: rows[dim].cat.rename_categories(categories)
+            for dim, categories in self._model_categories.items()
+        })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Top-ranked scored sessions under optional filters.")
+    parser.add_argument("--input", default=SCORED_STORE, help="scored sessions (CSV or Parquet, see scripts.score)")
+    parser.add_argument("--n", type=int, default=None, help="at most this many sessions")
+    parser.add_argument("--pct", type=float, default=None, help="only the top PCT %% of all scored sessions")
+    parser.add_argument("--filter", action="append", default=[], metavar="DIM=VALUE",
+                        help="keep sessions whose DIM is VALUE (repeatable; labelled values)")
+    parser.add_argument("--export", default=None, metavar="PATH",
+                        help="write the selected sessions to PATH (.csv or .parquet) instead of printing them")
+    args = parser.parse_args()
+
+    from scripts.data_access import load_frame
+
+    filters = {}
+    for item in args.filter:
+        dim, value = item.split("=", 1)
+        filters.setdefault(dim, []).append(value)
+    index = CandidateIndex(load_frame(args.input))
+    ranks = index.ranks(filters, args.n, args.pct)
+    if args.export:
+        fmt = "parquet" if args.export.endswith(".parquet") else "csv"
+        with open(f"{args.export}.tmp", "wb") as out:
+            index.export(ranks, out, fmt)
+        os.replace(f"{args.export}.tmp", args.export)
+        print(f"Exported {len(ranks):,} of {index.size:,} scored sessions to '{args.export}'")
+        return
+    print(index.page(ranks, size=len(ranks))[DIMENSIONS + ["p_conversion"]].to_string())
+    print(f"{len(ranks):,} of {index.size:,} scored sessions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,719 @@
+"""Dashboard charts, built from the session cube without Streamlit.
+
+Each chart is split into an aggregate step, ``*_data(cube)``, which rolls the
+cube up into one small frame, and a figure step, ``*_figure(data)``, which
+only draws. The pages and the headless PNG renderer (``scripts.render_charts``)
+share both, so the Homepage images match the interactive pages.
+
+Plotly is imported by the figure steps only, so roll-ups (and the renderer's
+up-to-date check, which hashes the aggregates) don't pay for importing it.
+
+Pages draw through ``cached_figure(name, data)``, which keeps the serialized
+figure JSON of recent (aggregate, styling) combinations in a bounded LRU, so
+a rerun over unchanged data skips the figure step entirely.
+"""
+import hashlib
+import inspect
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from scripts.cube import DURATION_LABELS, rollup
+from scripts.funnel import FUNNEL_STAGES
+
+PAPER_BG = "#2E2E2E"
+ACCENT   = "#e65100"
+SOURCE_NOTE = "Google Analytics 360 Demo (Google Merchandise Store, 2016–2017)"
+
+# Shared by the country map and the heatmap
+RATE_COLORSCALE = [
+    [0.00, "#08306B"], [0.20, "#2171B5"], [0.40, "#41B6C4"],
+    [0.50, "#FFFFBF"], [0.60, "#FEE08B"], [0.80, "#FC4E2A"],
+    [1.00, "#B10026"]
+]
+
+
+def frame_hash(df):
+    """Content hash of an aggregate frame (values, index and column names)."""
+    digest = hashlib.sha256()
+    digest.update(repr(list(df.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+# ── Country conversion map ───────────────────────────────
+MIN_SESS = 100  # traffic filter
+
+
+def country_data(cube, min_sessions=MIN_SESS):
+    """Sessions, conversions, rate (%) and ISO-3 code per country with enough traffic."""
+    # Plotly's choropleth locates countries by ISO-3 code, attached at cleaning;
+    # countries without one drop out of the roll-up
+    country = rollup(cube, ["country", "iso3"]).reset_index("iso3")
+    country = country[["sessions", "conversions"]].assign(
+        rate=country["conversions"] / country["sessions"] * 100,
+        iso3=country["iso3"].astype(str),
+    )
+    return country[country["sessions"] >= min_sessions]  # drop tiny samples
+
+
+def country_figure(country):
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+
+    fig.add_trace(
+        go.Choropleth(
+            locations   = country["iso3"],
+            z           = country["rate"],
+            text        = country.index,
+            # custom rainbow-ish scale
+            colorscale  = RATE_COLORSCALE,
+            reversescale=False,
+            marker_line_color="#FFFFFF",
+            marker_line_width=0.5,
+
+            # vertical color-bar (title drawn separately as annotation)
+            colorbar=dict(
+                x=0.037, y=0.15,              # bottom-left inside map
+                xanchor="center", yanchor="bottom",
+                len=0.60, thickness=25,
+                tickfont=dict(size=18, color="#FFFFFF"),
+                outlinecolor="#FFFFFF", outlinewidth=1
+            ),
+        )
+    )
+
+    # Custom colorbar label
+    fig.add_annotation(
+        text="Conversion Rate (%)",
+        textangle=-90, xref="paper", yref="paper",
+        x=0.00, y=0.45,
+        showarrow=False,
+        font=dict(size=20, color="#FFFFFF", family="Helvetica Neue Bold")
+    )
+
+    # Map projection and styling
+    fig.update_geos(
+        projection_type="equirectangular",   # fast, rectangular projection
+        projection_scale=1,                 # zoom factor
+        bgcolor=PAPER_BG,                   # behind-globe colour
+        showocean=True,  oceancolor="#08274A",
+        showland=True,   landcolor="#0e0f1e",
+        showcountries=False, coastlinewidth=0,
+        showframe=False,
+        domain=dict(x=[0, 1], y=[0, 1])     # map fills subplot
+    )
+
+    # Layout, title, fonts, and margins
+    fig.update_layout(
+        title=dict(
+            text=f"Conversion Rate by Country (sessions ≥ {MIN_SESS})",
+            x=0.5, y=0.98, xanchor="center",
+            pad=dict(b=4),
+            font=dict(size=28, color=ACCENT, family="Helvetica Neue Bold")
+        ),
+        font=dict(family="Helvetica Neue", color="#FFFFFF", size=16),
+        paper_bgcolor=PAPER_BG,
+        plot_bgcolor=PAPER_BG,
+        height=780,
+        margin=dict(t=20, l=0, r=0, b=20)
+    )
+
+    # Footer: source annotation and overall metrics
+    total_sessions   = int(country["sessions"].sum())
+    overall_rate_pct = country["conversions"].sum() / total_sessions * 100
+
+    fig.add_annotation(
+        text=SOURCE_NOTE,
+        xref="paper", yref="paper",
+        x=0.01, y=-0.02,
+        xanchor="left", yanchor="bottom",
+        showarrow=False,
+        font=dict(size=20, color=ACCENT, family="Helvetica Neue Bold")
+    )
+
+    fig.add_annotation(
+        text=f"Total sessions: {total_sessions:,}  •  Overall conv-rate: {overall_rate_pct:.2f} %",
+        xref="paper", yref="paper",
+        x=0.99, y=-0.02,
+        xanchor="right", yanchor="bottom",
+        showarrow=False,
+        font=dict(size=20, color=ACCENT, family="Helvetica Neue Bold")
+    )
+    return fig
+
+
+# ── Funnel drop-off by device ────────────────────────────
+# device-line colours: neon cyberpunk
+DEVICE_PAL = {
+    "desktop": "#00E5FF",  # teal
+    "tablet" : "#FF4C4C",  # reddish
+    "mobile" : "#88CC00"   # darker green
+}
+
+# table & subplot background shades: darker neon variants
+DEVICE_SHADE = {
+    "desktop": "#003F40",  # even darker teal
+    "tablet" : "#7F0000",  # darker red
+    "mobile" : "#224400"   # deeper green
+}
+
+def _device_order(devices):
+    # Fixed subplot order (DEVICE_PAL's: desktop, tablet, mobile), then any other device
+    present = set(pd.Series(devices).astype(str))
+    return [dev for dev in DEVICE_PAL if dev in present] + sorted(present - set(DEVICE_PAL))
+
+
+FUNNEL_STAGE = [*FUNNEL_STAGES[1:], "Converted"]   # bounced sessions never enter the funnel
+
+
+def funnel_data(cube):
+    """Sessions per device and funnel stage, with "Converted" holding the device's conversions."""
+    funnel = {"funnel_stage": FUNNEL_STAGE}   # only sessions that entered the funnel
+
+    # roll up absolute sessions per device / stage
+    base = pd.DataFrame({"funnel_stage": FUNNEL_STAGE})
+    agg  = (rollup(cube, ["devicecategory", "funnel_stage"], funnel)["sessions"]
+              .reset_index())
+    agg["funnel_stage"] = agg["funnel_stage"].astype(str)
+
+    # also roll up total conversions per device
+    conv_agg = rollup(cube, "devicecategory", funnel)["conversions"]
+
+    per_device = []
+    for dev in _device_order(agg["devicecategory"].unique()):
+        a = (base.merge(agg.loc[agg.devicecategory == dev, ["funnel_stage", "sessions"]],
+                        on="funnel_stage", how="left").fillna({"sessions": 0}))
+        # override "Converted" stage count with actual conversions
+        a.loc[a.funnel_stage == "Converted", "sessions"] = conv_agg[dev]
+        per_device.append(a.assign(devicecategory=dev))
+    return pd.concat(per_device, ignore_index=True)[["devicecategory", "funnel_stage", "sessions"]]
+
+
+def funnel_figure(data):
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    devices = _device_order(data["devicecategory"].unique())
+    fig = make_subplots(
+        rows=len(devices),
+        cols=2,
+        shared_xaxes=True,
+        column_widths=[0.65, 0.35],
+        vertical_spacing=0.05,   # more breathing room between device plots
+        horizontal_spacing=0.02,
+        specs=[[{"type":"xy"}, {"type":"table"}] for _ in devices]
+    )
+
+    # draw a shaded rectangle behind each device plot in the left column
+    for idx, dev in enumerate(devices):
+        row = idx + 1   # Plotly rows are 1‑indexed
+        fig.add_shape(
+            type="rect",
+            # draw in axis domain coordinates, not paper
+            xref="x domain" if row == 1 else f"x{row} domain",
+            yref="y domain" if row == 1 else f"y{row} domain",
+            x0=0, x1=1,                   # full width of that subplot
+            y0=0, y1=1,                   # full height of that subplot
+            row=row, col=1,               # place shape in left column of this row
+            fillcolor=DEVICE_SHADE[dev],
+            layer="below",
+            line=dict(color="#FFFFFF", width=1)
+        )
+
+    # %-survival lines (left y-axis) and a stage table per device
+    for r, dev in enumerate(devices, start=1):
+        a = data[data.devicecategory == dev]
+        entry = a.loc[a.funnel_stage == "Browsed", "sessions"].iat[0] or np.nan
+        pct   = (a["sessions"] / entry * 100).round(1)
+        # add a tiny epsilon so log‐scale never sees pure 0
+        pct_safe = pct.replace(0, 0.2)
+
+        fig.add_trace(go.Scatter(
+            x=FUNNEL_STAGE, y=pct_safe,
+            mode="lines+markers+text",
+            line=dict(width=4, color=DEVICE_PAL.get(dev, "#cccccc")),
+            marker=dict(size=10, color=DEVICE_PAL.get(dev, "#cccccc")),
+            text=[f"{p:.1f} %" for p in pct],
+            textposition="top center",
+            name=dev.title()
+        ), row=r, col=1)
+
+        fig.add_annotation(
+            xref="paper", yref=f'y{r}' if r > 1 else 'y',
+            x=-0.04, y=np.nanmax(pct)/2,  # roughly mid‑height
+            text=f"<b>{dev.title()}</b>",
+            showarrow=False,
+            font=dict(family="Helvetica Neue", size=14, color="#ffffff")
+        )
+
+        # table values for this device
+        stages = a["funnel_stage"]
+        sessions = a["sessions"].astype(int)
+        survive_pct = [(s/entry*100).round(1) for s in a["sessions"]]
+
+        fig.add_trace(
+            go.Table(
+                header=dict(
+                    values=["Stage", "Sessions", "Survive %"],
+                    fill_color=DEVICE_PAL[dev], font=dict(family="Helvetica Neue Bold", color="white"),
+                    align="center", height=28,
+                    line_color="#FFFFFF", line_width=1
+                ),
+                cells=dict(
+                    values=[stages, sessions, survive_pct],
+                    fill_color=DEVICE_SHADE[dev], font=dict(family="Helvetica Neue Bold", color="white"),
+                    align="center", height=24,
+                    line_color="#FFFFFF", line_width=0.5
+                )
+            ),
+            row=r, col=2
+        )
+
+    # visual 0 % guide line on each subplot: log‑scale cannot display an
+    # actual 0, so the line sits at 0.1 %
+    for r in range(1, len(devices) + 1):
+        fig.add_shape(
+            type="line",
+            x0=0, x1=1,                 # full width of subplot
+            y0=0.1, y1=0.1,             # 0.1 % (10^-1) ≈ “zero” reference
+            xref="x domain",
+            yref=f"y{r}" if r > 1 else "y",
+            line=dict(color="#444", width=1, dash="dot"),
+            layer="below",
+        )
+
+    # highlight major grid lines at 1%, 10%, 100%
+    for r in range(1, len(devices) + 1):
+        for y_val in [1, 10, 100]:
+            fig.add_shape(
+                type="line",
+                x0=0, x1=1,
+                y0=y_val, y1=y_val,
+                xref="x domain",
+                yref=f"y{r}" if r > 1 else "y",
+                line=dict(color="#FFFFFF", width=2),
+                layer="below",
+            )
+
+    # vertical dividers between stages
+    for stage in FUNNEL_STAGE:
+        fig.add_shape(
+            type="line",
+            x0=stage, x1=stage,
+            y0=0, y1=1,
+            xref="x", yref="paper",
+            line=dict(color="#FFFFFF", width=2, dash="dash"),
+            layer="below",
+        )
+
+    fig.update_yaxes(
+        title="% of entry (log scale)",
+        type="log",
+        dtick=1,                 # ticks at 1 %, 10 %, 100 %
+        tickvals=[0.1, 1, 10, 100],
+        ticktext=["0 %", "1 %", "10 %", "100 %"],
+        range=[-1, 2.5],
+        showgrid=True,
+        gridcolor="#555",
+        gridwidth=0.3
+    )
+
+    fig.update_layout(
+        title=dict(
+            text="Where do sessions leak? – Funnel stage vs. device",
+            x=0.5, xanchor="center", y=0.98, yanchor="top",
+            font=dict(size=26, color=ACCENT, family="Helvetica Neue Bold")
+        ),
+        legend=dict(
+            orientation="h",
+            y=1.06, yanchor="top",
+            x=0.5, xanchor="center"
+        ),
+        paper_bgcolor=PAPER_BG, plot_bgcolor=PAPER_BG,
+        font=dict(family="Helvetica Neue Bold", color="#ffffff", size=14),
+        height=240*len(devices)+120, margin=dict(t=90, l=80, r=40, b=40)
+    )
+
+    # enlarge the funnel stage labels on the x-axis
+    fig.update_xaxes(tickfont=dict(size=16))
+
+    fig.add_annotation(
+        text=SOURCE_NOTE,
+        xref="paper", yref="paper",
+        x=1.02, y=-0.05,
+        xanchor="right", yanchor="bottom",
+        showarrow=False,
+        font=dict(size=14, color=ACCENT, family="Helvetica Neue Bold")
+    )
+    return fig
+
+
+# ── Session duration vs. conversion ──────────────────────
+DURATION_DEVICE_COLORS = {
+    "desktop": "#64ffda",
+    "mobile":  "#00bcd4",
+    "tablet":  "#ff6b6b",
+}
+
+
+def duration_data(cube):
+    """Sessions, conversions and rate (%) per duration bucket and device.
+
+    Sessions outside the realistic range (1 to 3600 seconds) carry no
+    duration bucket, so they drop out of the roll-up.
+    """
+    agg = (
+        rollup(cube, ["duration_bucket", "devicecategory"])[["sessions", "conversions"]]
+        .rename_axis(["bucket", "devicecategory"])
+        .reset_index()
+    )
+    agg["conv_rate"] = agg["conversions"] / agg["sessions"] * 100
+    return agg
+
+
+def duration_figure(agg):
+    import plotly.graph_objects as go
+
+    # pivot tables for volumes and rates
+    pivot_vol = agg.pivot(index="bucket", columns="devicecategory", values="sessions").fillna(0)
+    pivot_cr  = agg.pivot(index="bucket", columns="devicecategory", values="conv_rate").fillna(0)
+
+    # grouped bars for volume + lines for conversion-rate
+    fig = go.Figure()
+
+    # Bars represent session volumes on secondary y-axis
+    for dev, col in DURATION_DEVICE_COLORS.items():
+        fig.add_trace(go.Bar(
+            x=DURATION_LABELS,
+            y=pivot_vol.get(dev, []),
+            name=f"{dev.title()} volume",
+            marker_color=col,
+            opacity=0.4,
+            yaxis="y2",
+            hovertemplate="%{y:,} sessions<extra></extra>"
+        ))
+
+    # Lines represent conversion rates on primary y-axis
+    for dev, col in DURATION_DEVICE_COLORS.items():
+        fig.add_trace(go.Scatter(
+            x=DURATION_LABELS,
+            y=pivot_cr.get(dev, []),
+            name=f"{dev.title()} conv‑rate",
+            mode="lines+markers",
+            marker=dict(size=8, color=col),
+            line=dict(width=3, color=col),
+            hovertemplate="%{y:.1f}% conv<extra></extra>"
+        ))
+
+    fig.update_layout(
+        # Title styling
+        title=dict(
+            text="Session Duration vs. Conversion by Device",
+            x=0.5, xanchor="center", y=0.95, yanchor="top",
+            font=dict(size=24, color=ACCENT, family="Helvetica Neue Bold")
+        ),
+        # Background and font
+        paper_bgcolor=PAPER_BG,
+        plot_bgcolor=PAPER_BG,
+        font=dict(family="Helvetica Neue Bold", color="#FFFFFF", size=14),
+        # Bar mode and legend positioning
+        barmode="group",
+        legend=dict(
+            orientation="h",
+            y=1.02,
+            x=0.5,
+            xanchor="center",
+            yanchor="bottom"
+        ),
+        # Margins
+        margin=dict(t=80, l=60, r=60, b=60),
+        # X-axis styling
+        xaxis=dict(
+            title=dict(
+                text="Session Duration Bucket",
+                font=dict(color=ACCENT, size=18)
+            ),
+            tickfont=dict(size=14)
+        ),
+        # Primary y-axis: conversion rate styling
+        yaxis=dict(
+            title=dict(
+                text="Conversion Rate (%)",
+                font=dict(color=ACCENT, size=18)
+            ),
+            tickfont=dict(color="#FFFFFF"),
+            range=[0, pivot_cr.values.max() * 1.1]
+        ),
+        # Secondary y-axis: session volume styling
+        yaxis2=dict(
+            title=dict(
+                text="Sessions",
+                font=dict(color=ACCENT, size=18)
+            ),
+            tickfont=dict(color="#FFFFFF"),
+            overlaying="y",
+            side="right",
+            position=1.0,
+            range=[0, pivot_vol.values.max() * 1.1]
+        )
+    )
+
+    # grid & zero‑lines for clarity
+    fig.update_xaxes(showgrid=False)
+    fig.update_yaxes(showgrid=True, gridcolor="#555", zeroline=True, zerolinecolor="#888")
+
+    # Footer annotation with data source
+    fig.add_annotation(
+        text=SOURCE_NOTE,
+        xref="paper", yref="paper",
+        x=1.045, y=-0.23,
+        xanchor="right", yanchor="bottom",
+        showarrow=False,
+        font=dict(size=14, color=ACCENT, family="Helvetica Neue Bold")
+    )
+    return fig
+
+
+# ── Source × device heatmap ──────────────────────────────
+# Friendly names for specific traffic source keys
+HEATMAP_SOURCE_MAP = {
+    'calendar.google.com': 'Google Calendar',
+    'outlook.live.com': 'Microsoft Outlook',
+    'google': 'Google',
+    'dfa': 'Google Display Ads',        # remap DFA doubleclick traffic
+    '(direct)': 'Direct Traffic',         # remap no-referrer direct visits
+}
+
+
+def heatmap_data(cube, top=10):
+    """Conversion rate (%) per source × device for the `top` sources by average rate."""
+    rates = rollup(cube, ["source", "devicecategory"])
+    pivot = (
+        (rates["conversions"] / rates["sessions"])   # fraction of sessions that converted
+        .mul(100)         # to percent
+        .round(1)         # one decimal
+        .rename("converted")
+        .reset_index()
+        .pivot(index="source", columns="devicecategory", values="converted")
+        .fillna(0)
+    )
+
+    # Remove traffic sources with 0% conversion across all devices
+    pivot = pivot.loc[(pivot > 0).any(axis=1)]
+
+    # Sort by average conversion rate across devices and keep the top sources
+    pivot["avg_conv"] = pivot.mean(axis=1)
+    pivot = pivot.sort_values("avg_conv", ascending=False).head(top).drop(columns="avg_conv")
+
+    # Title-case device columns (e.g. 'desktop' → 'Desktop') and friendly source names
+    pivot.columns = pivot.columns.str.title()
+    pivot.index = [HEATMAP_SOURCE_MAP.get(src, src) for src in pivot.index]
+    return pivot
+
+
+def heatmap_figure(pivot):
+    import plotly.express as px
+
+    fig = px.imshow(
+        pivot,
+        color_continuous_scale=RATE_COLORSCALE,
+        text_auto=True,
+        labels=dict(x="Device Category", y="Traffic Source", color="Conv‑Rate (%)"),
+        aspect="auto"
+    )
+
+    # build per-cell HTML colored text
+    z = fig.data[0].z  # 2D array of values
+    threshold = pivot.values.max() * 0.5  # choose threshold
+    text_html = [
+        [
+            f"<span style='color:{'black' if val >= threshold else 'white'}'>{val}</span>"
+            for val in row
+        ]
+        for row in z
+    ]
+    fig.data[0].text = text_html
+    fig.data[0].texttemplate = "%{text}"
+    fig.data[0].textfont = dict(size=18, family="Helvetica Neue Bold")
+
+    # draw thin white lines between cells
+    fig.update_traces(xgap=1, ygap=1)
+
+    # white outlines between heatmap cells
+    nrows, ncols = pivot.shape
+    grid_shapes = []
+
+    # vertical lines
+    for i in range(ncols + 1):
+        x = i / ncols
+        grid_shapes.append(dict(
+            type="line", xref="paper", yref="paper",
+            x0=x, x1=x, y0=0, y1=1,
+            line=dict(color="#FFFFFF", width=0.5)
+        ))
+
+    # horizontal lines
+    for j in range(nrows + 1):
+        y = j / nrows
+        grid_shapes.append(dict(
+            type="line", xref="paper", yref="paper",
+            x0=0, x1=1, y0=y, y1=y,
+            line=dict(color="#FFFFFF", width=0.5)
+        ))
+
+    # merge with existing shapes
+    fig.update_layout(shapes=tuple(fig.layout.shapes) + tuple(grid_shapes))
+
+    border_shape = dict(
+        type="rect",
+        xref="paper", yref="paper",
+        x0=0, y0=0, x1=1, y1=1,
+        line=dict(color="#FFFFFF", width=1)
+    )
+
+    all_shapes = tuple(fig.layout.shapes) + (border_shape,)
+
+    fig.update_layout(
+        title=dict(
+            text="Top 10 Traffic Sources by Conversion Rate and Device",
+            x=0.5, xanchor="center", y=0.95, yanchor="top",
+            font=dict(size=24, color=ACCENT, family="Helvetica Neue Bold"),
+            pad=dict(b=0)  # reduce space below the title
+        ),
+        paper_bgcolor=PAPER_BG,
+        plot_bgcolor=PAPER_BG,
+        font=dict(family="Helvetica Neue Bold", color="#FFFFFF", size=16),
+        margin=dict(l=60, r=80, t=60, b=40),
+        shapes=all_shapes,
+    )
+
+    # bring x‑axis tick labels closer to the heatmap
+    fig.update_xaxes(ticklabelstandoff=-10)
+
+    # Enlarge axis titles with bold text and font
+    fig.update_xaxes(
+        title=dict(
+            text="<b>Device Category</b>",
+            font=dict(size=20, color=ACCENT, family="Helvetica Neue Bold")
+        ),
+        tickfont=dict(size=14, color="#FFFFFF", family="Helvetica Neue Bold")
+    )
+    fig.update_yaxes(
+        title=dict(
+            text="<b>Traffic Source</b>",
+            font=dict(size=20, color=ACCENT, family="Helvetica Neue Bold")
+        ),
+        tickfont=dict(size=14, color="#FFFFFF", family="Helvetica Neue Bold")
+    )
+
+    # Colorbar to our spec
+    fig.update_coloraxes(
+        colorbar_title_text=None,
+        colorbar_tickfont=dict(size=12, color="#FFFFFF", family="Helvetica Neue Bold"),
+        colorbar_outlinecolor="#FFFFFF",
+        colorbar_outlinewidth=1,
+        colorbar_lenmode="fraction",
+        colorbar_len=1,
+        colorbar_thickness=20,
+        colorbar_x=1.01,
+        colorbar_xanchor="left",
+        colorbar_y=0.5,
+        colorbar_yanchor="middle",
+    )
+
+    # Manual vertical colorbar label on inner side
+    fig.add_annotation(
+        text="Conversion Rate (%)",
+        textangle=-90,
+        xref="paper", yref="paper",
+        x=1.015, y=0.5,               # just inside the bar
+        xanchor="center", yanchor="middle",
+        showarrow=False,
+        font=dict(size=18, color="#FFFFFF", family="Helvetica Neue Bold")
+    )
+
+    fig.add_annotation(
+        text=SOURCE_NOTE,
+        xref="paper", yref="paper",
+        x=1.08, y=-0.21,
+        xanchor="right", yanchor="bottom",
+        showarrow=False,
+        font=dict(size=14, color=ACCENT, family="Helvetica Neue Bold")
+    )
+    return fig
+
+
+# Chart name (also the PNG's file name under outputs/) → (aggregate step, figure step)
+CHARTS = {
+    "country_conversion_map": (country_data, country_figure),
+    "funnel_dropoff_by_device": (funnel_data, funnel_figure),
+    "session_duration_vs_conversion": (duration_data, duration_figure),
+    "source_device_heatmap": (heatmap_data, heatmap_figure),
+}
+
+
+# ── Figure cache ─────────────────────────────────────────
+FIGURE_CACHE_SIZE = 32  # figures kept per process; each is ~10–20 kB of JSON
+
+_figures = OrderedDict()
+_figures_lock = threading.Lock()
+_figure_stats = {"hits": 0, "misses": 0}
+
+
+def style_hash():
+    """Hash of the module's styling constants (colors, palettes, notes) the figure steps read."""
+    constants = {name: value for name, value in globals().items()
+                 if name.isupper() and name not in ("CHARTS", "FIGURE_CACHE_SIZE")}
+    return hashlib.sha256(repr(sorted(constants.items())).encode()).hexdigest()
+
+
+def figure_key(name, data):
+    """Hash of everything CHARTS[name]'s figure depends on: data, figure code and styling."""
+    digest = hashlib.sha256()
+    digest.update(frame_hash(data).encode())
+    digest.update(inspect.getsource(CHARTS[name][1]).encode())
+    digest.update(style_hash().encode())
+    return digest.hexdigest()
+
+
+def cached_figure(name, data, maxsize=FIGURE_CACHE_SIZE):
+    """CHARTS[name]'s figure for data, rebuilt from cached JSON when already drawn.
+
+    Each call returns a new Figure, so callers may modify it.
+    """
+    import plotly.graph_objects as go
+    import plotly.io as pio
+
+    key = (name, figure_key(name, data))
+    with _figures_lock:
+        spec = _figures.get(key)
+        if spec is not None:
+            _figures.move_to_end(key)
+        _figure_stats["hits" if spec is not None else "misses"] += 1
+    if spec is None:
+        # Built outside the lock: a concurrent miss on the same key only repeats the work
+        spec = pio.to_json(CHARTS[name][1](data), validate=False)
+        with _figures_lock:
+            _figures[key] = spec
+            _figures.move_to_end(key)
+            while len(_figures) > maxsize:
+                _figures.popitem(last=False)
+    # The JSON was produced from a validated figure, so it needn't be validated again
+    return go.Figure(json.loads(spec), _validate=False)
+
+
+def figure_cache_info():
+    """Hits, misses and current size of the figure cache."""
+    with _figures_lock:
+        return {**_figure_stats, "size": len(_figures), "maxsize": FIGURE_CACHE_SIZE}
+
+
+def clear_figure_cache():
+    with _figures_lock:
+        _figures.clear()
+        _figure_stats.update(hits=0, misses=0)
@@ -1,38 +1,143 @@
+import argparse
+import os
+import shutil
+import time
+from collections import Counter
+
 import pandas as pd
 
-# Load the raw CSV file
-df = pd.read_csv('data/raw_sessions.csv')  # Adjust the path if needed
+from scripts.countries import ISO3_TABLE, iso3_codes, read_iso3_table
+from scripts.funnel import STAGE_EDGES, classify_stages
+from scripts.session_store import (
+    CLEANED_STORE, SESSIONS_DIR, SessionWriter, list_partitions, partition_path,
+    read_manifest, write_manifest, write_sessions,
+)
+
+RAW_PATH = 'data/raw_sessions.csv'
+CLEANED_PATH = 'data/cleaned_sessions.csv'  # optional CSV export for ad-hoc analysis
+CHUNK_SIZE = 250_000  # rows per chunk; bounds peak memory regardless of input size
+
+
+def clean_chunk(df, stage_edges=STAGE_EDGES, iso3=None):
+    # Convert column names to lowercase
+    df.columns = [col.lower() for col in df.columns]
+
+    # Convert 'date' column to datetime format
+    df['date'] = pd.to_datetime(df['date'], format='%Y%m%d')
+
+    # Fill missing values (cast to float so every chunk serialises the same way,
+    # even when a chunk happens to contain no missing values)
+    df['pageviews'] = df['pageviews'].fillna(0).astype(float)
+    df['timeonsite'] = df['timeonsite'].fillna(0).astype(float)
+
+    # Create a 'converted' column: 1 if a transaction occurred, 0 otherwise
+    df['converted'] = df['transactions'].fillna(0).astype(int)
+
+    # Normalize 'transactionrevenue' from micros to dollars
+    df['revenue'] = df['transactionrevenue'].fillna(0) / 1_000_000
+
+    # Create a simplified funnel_stage column based on pageviews
+    df['funnel_stage'] = classify_stages(df['pageviews'], stage_edges)
+
+    # Attach the precomputed ISO-3 code of each country (see scripts/countries.py)
+    if iso3 is not None:
+        df['iso3'] = iso3_codes(df['country'], iso3)
+    return df
+
+
+def clean_sessions(raw_path=RAW_PATH, store_path=CLEANED_STORE, csv_path=None,
+                   chunksize=CHUNK_SIZE, stage_edges=STAGE_EDGES, iso3_path=ISO3_TABLE):
+    # Stream the raw export in fixed-size chunks and append each cleaned chunk
+    # to the Parquet store (and optionally a CSV), so only one chunk is ever
+    # held in memory
+    iso3 = read_iso3_table(iso3_path)
+    rows = 0
+    reader = pd.read_csv(raw_path, chunksize=chunksize,
+                         dtype={'transactions': float, 'transactionRevenue': float})
+    with SessionWriter(store_path) as writer:
+        for i, chunk in enumerate(reader):
+            chunk = clean_chunk(chunk, stage_edges, iso3)
+            writer.write(chunk)
+            if csv_path:
+                chunk.to_csv(csv_path, index=False, mode='w' if i == 0 else 'a', header=i == 0)
+            rows += len(chunk)
+    return rows
+
+
+def ingest_incremental(raw_path=RAW_PATH, root=SESSIONS_DIR, chunksize=CHUNK_SIZE,
+                       stage_edges=STAGE_EDGES, iso3_path=ISO3_TABLE):
+    # Clean only the days not yet listed in the manifest and append them to the
+    # date-partitioned store; days already ingested are skipped entirely
+    iso3 = read_iso3_table(iso3_path)
+    manifest = read_manifest(root)
+    done = set(manifest["dates"])
+    run_id = time.strftime('%Y%m%dT%H%M%S')
+    new_rows = Counter()
+
+    # Readers scan every file under root, so a day only appears there once it is
+    # complete: parts are written to a staging directory beside root and each day
+    # is moved into place after the whole input has been read. Partitions the
+    # manifest doesn't list are left over from an interrupted run; drop them
+    staging = f"{root.rstrip(os.sep)}.staging"
+    shutil.rmtree(staging, ignore_errors=True)
+    for day, directory in list_partitions(root):
+        if day not in done:
+            shutil.rmtree(directory)
 
-# Convert column names to lowercase
-df.columns = [col.lower() for col in df.columns]
+    reader = pd.read_csv(raw_path, chunksize=chunksize,
+                         dtype={'transactions': float, 'transactionRevenue': float})
+    for i, chunk in enumerate(reader):
+        chunk = clean_chunk(chunk, stage_edges, iso3)
+        days = chunk['date'].dt.strftime('%Y-%m-%d')
+        fresh = ~days.isin(done)
+        for day, part in chunk[fresh].groupby(days[fresh]):
+            write_sessions(part, os.path.join(partition_path(staging, day), f'part-{run_id}-{i:05d}.parquet'))
+            new_rows[day] += len(part)
 
-# Convert 'date' column to datetime format
-df['date'] = pd.to_datetime(df['date'], format='%Y%m%d')
+    for day in new_rows:
+        os.makedirs(root, exist_ok=True)
+        os.replace(partition_path(staging, day), partition_path(root, day))
+    shutil.rmtree(staging, ignore_errors=True)
 
-# Fill missing values
-df['pageviews'] = df['pageviews'].fillna(0)
-df['timeonsite'] = df['timeonsite'].fillna(0)
+    # Record the new days only once every partition is in place
+    for day, rows in new_rows.items():
+        manifest["dates"][day] = {"rows": rows, "source": raw_path, "run": run_id}
+    write_manifest(root, manifest)
+    return dict(sorted(new_rows.items()))
 
-# Create a 'converted' column: 1 if a transaction occurred, 0 otherwise
-df['converted'] = df['transactions'].fillna(0).astype(int)
 
-# Normalize 'transactionrevenue' from micros to dollars
-df['revenue'] = df['transactionrevenue'].fillna(0) / 1_000_000
+def main():
+    parser = argparse.ArgumentParser(description="Clean the raw GA session export.")
+    parser.add_argument('--input', default=RAW_PATH, help="raw sessions CSV")
+    parser.add_argument('--output', default=CLEANED_STORE, help="cleaned sessions Parquet store")
+    parser.add_argument('--csv', nargs='?', const=CLEANED_PATH, default=None,
+                        help=f"also export a CSV copy (default path: {CLEANED_PATH})")
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE,
+                        help="rows read and cleaned per chunk")
+    parser.add_argument('--stage-edges', type=float, nargs=3, default=STAGE_EDGES,
+                        metavar=('BOUNCE', 'ENGAGED', 'DEEP'),
+                        help="pageview thresholds separating the funnel stages")
+    parser.add_argument('--iso3-table', default=ISO3_TABLE,
+                        help="country -> ISO-3 table (build it with `python -m scripts.countries`)")
+    parser.add_argument('--incremental', nargs='?', const=SESSIONS_DIR, default=None, metavar='DIR',
+                        help=f"append only not-yet-ingested days to a date-partitioned store "
+                             f"(default: {SESSIONS_DIR}) instead of rewriting --output")
+    args = parser.parse_args()
 
-# Create a simplified funnel_stage column based on pageviews
-def classify_stage(pv):
-    if pv == 0:
-        return "Bounced"
-    elif pv < 5:
-        return "Browsed"
-    elif pv < 10:
-        return "Engaged"
-    else:
-        return "Deep Engagement"
+    if args.incremental:
+        new_days = ingest_incremental(args.input, args.incremental, args.chunksize,
+                                      tuple(args.stage_edges), args.iso3_table)
+        for day, rows in new_days.items():
+            print(f"  {day}: {rows:,} sessions")
+        print(f"Ingested {len(new_days)} new day(s) into '{args.incremental}'")
+        return
 
-df['funnel_stage'] = df['pageviews'].apply(classify_stage)
+    rows = clean_sessions(args.input, args.output, args.csv, args.chunksize,
+                          tuple(args.stage_edges), args.iso3_table)
+    print(f"Cleaned {rows:,} sessions saved to '{args.output}'")
+    if args.csv:
+        print(f"CSV copy saved to '{args.csv}'")
 
-# Save the cleaned data to a new CSV
-df.to_csv('data/cleaned_sessions.csv', index=False)
 
-print("Cleaned data saved to 'cleaned_sessions.csv'")
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,310 @@
+"""Dependency-light inference: the fitted pipeline compiled to flat NumPy arrays.
+
+Compiling folds the preprocessor into the tree ensemble:
+
+* numeric columns are binned once by every split point the trees use on
+  them, with ``StandardScaler`` folded into those split points (each is the
+  first raw value whose scaled float32 no longer goes left, so decisions
+  match the pipeline bit for bit); categorical columns are used as codes,
+  so one-hot splits become per-code decisions and no one-hot matrix exists;
+* trees are grouped by the columns they split on, and for every group the
+  summed leaf weights are tabulated over the (few) distinguishable code
+  combinations of those columns. Scoring a group is then one key
+  computation (a lookup and an add per column) and one table lookup,
+  instead of a walk down each tree.
+
+Scoring a compiled model needs only numpy and pandas. Export with
+
+    python -m scripts.compiled_model --model models/conversion_model.joblib --output models/conversion_model.npz
+
+and pass the ``.npz`` wherever a model path is accepted
+(``scripts.score --model``, ``scripts.scoring_service --model``).
+"""
+import argparse
+import json
+
+import numpy as np
+import pandas as pd
+
+from scripts.model_artifact import MODEL_PATH, load_artifact
+
+COMPILED_MODEL_PATH = "models/conversion_model.npz"
+
+# Largest leaf-sum table built for one group of trees (entries)
+MAX_TABLE = 1 << 16
+
+
+def _split(flat, offsets):
+    return [flat[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+
+class CompiledModel:
+    """Tree ensemble over raw model columns, stored as flat lookup tables."""
+
+    def __init__(self, columns, vocab, fallback, edges, base_margin, groups):
+        self.columns = list(columns)
+        self.vocab = [list(v) for v in vocab]  # categories of the first len(vocab) columns
+        self.fallback = np.asarray(fallback, dtype=np.int32)  # code for values outside a column's vocabulary
+        self.edges = [np.asarray(e, dtype=np.float64) for e in edges]  # bin edges of the numeric columns
+        self.base_margin = float(base_margin)
+        # [(column indices, per-column code -> key-offset lookups, leaf-sum table)]
+        self.groups = groups
+
+    # ── scoring ──
+    def encode(self, frame):
+        """Per-column integer codes for frame: category codes, or bins of numeric
+        values between split points (missing values get the last bin)."""
+        codes = []
+        for i, col in enumerate(self.columns):
+            if i < len(self.vocab):
+                c = pd.Categorical(frame[col], categories=self.vocab[i]).codes.astype(np.int32)
+                codes.append(np.where(c < 0, self.fallback[i], c))
+            else:
+                edges = self.edges[i - len(self.vocab)]
+                x = frame[col].to_numpy(dtype=np.float64, na_value=np.nan)
+                c = np.searchsorted(edges, x, side="right").astype(np.int32)
+                c[np.isnan(x)] = len(edges) + 1
+                codes.append(c)
+        return codes
+
+    def margins(self, codes):
+        """Raw (log-odds) ensemble output from encoded columns."""
+        margin = np.full(len(codes[0]), self.base_margin)
+        for cols, luts, table in self.groups:
+            key = luts[0][codes[cols[0]]]
+            for col, lut in zip(cols[1:], luts[1:]):
+                key += lut[codes[col]]
+            margin += table[key]
+        return margin
+
+    def predict_proba(self, frame):
+        """Conversion probability for each row of frame (a model frame or raw session columns)."""
+        return (1.0 / (1.0 + np.exp(-self.margins(self.encode(frame))))).astype(np.float32)
+
+    # ── persistence ──
+    def save(self, path, **meta):
+        group_cols = [np.asarray(cols, dtype=np.int32) for cols, _, _ in self.groups]
+        luts = [lut for _, group_luts, _ in self.groups for lut in group_luts]
+        tables = [table for _, _, table in self.groups]
+        header = {"columns": self.columns, "vocab": self.vocab, "base_margin": self.base_margin, **meta}
+        np.savez(
+            path, header=np.array(json.dumps(header)), fallback=self.fallback,
+            edges=np.concatenate(self.edges), edge_offsets=np.cumsum([0] + [len(e) for e in self.edges]),
+            group_cols=np.concatenate(group_cols), group_offsets=np.cumsum([0] + [len(c) for c in group_cols]),
+            luts=np.concatenate(luts), lut_offsets=np.cumsum([0] + [len(lut) for lut in luts]),
+            tables=np.concatenate(tables), table_offsets=np.cumsum([0] + [len(t) for t in tables]),
+        )
+
+    @classmethod
+    def load(cls, path):
+        """(model, meta) from a file written by save."""
+        with np.load(path, allow_pickle=False) as data:
+            header = json.loads(str(data["header"]))
+            group_cols = _split(data["group_cols"], data["group_offsets"])
+            luts = iter(_split(data["luts"], data["lut_offsets"]))
+            tables = _split(data["tables"], data["table_offsets"])
+            groups = [(cols.tolist(), [next(luts) for _ in cols], table) for cols, table in zip(group_cols, tables)]
+            model = cls(header.pop("columns"), header.pop("vocab"), data["fallback"],
+                        _split(data["edges"], data["edge_offsets"]), header.pop("base_margin"), groups)
+        return model, header
+
+
+# ── compilation (needs the fitted sklearn/xgboost objects, i.e. runs at export time) ──
+def _fold_threshold(threshold, mean, scale):
+    # Smallest raw x whose scaled float32 value is no longer < threshold, so that
+    # "x < result" reproduces the split on the scaled feature bit for bit
+    threshold = np.float32(threshold)
+
+    def goes_left(x):
+        return np.float32((x - mean) / scale) < threshold
+
+    guess = float(threshold) * scale + mean
+    width = abs(guess) * 1e-6 + 1e-9
+    lo, hi = guess - width, guess + width
+    while not goes_left(lo):
+        lo -= width
+        width *= 2
+    while goes_left(hi):
+        hi += width
+        width *= 2
+    while np.nextafter(lo, np.inf) < hi:
+        mid = lo + (hi - lo) / 2
+        if mid <= lo or mid >= hi:
+            mid = np.nextafter(lo, np.inf)
+        if goes_left(mid):
+            lo = mid
+        else:
+            hi = mid
+    return hi
+
+
+class _Tree:
+    """One tree over raw columns; each split holds its go-left decision for every code of its column."""
+
+    def __init__(self, col, decide, left, right, value):
+        self.col, self.decide, self.left, self.right, self.value = col, decide, left, right, value
+
+    def splits(self):
+        return [(c, d) for c, d in zip(self.col, self.decide) if c >= 0]
+
+    def evaluate(self, codes):
+        # Leaf weight reached by every row of codes (a column -> code array mapping)
+        rows = len(next(iter(codes.values())))
+        out = np.empty(rows)
+        stack = [(0, np.arange(rows))]
+        while stack:
+            node, idx = stack.pop()
+            if self.col[node] < 0:
+                out[idx] = self.value[node]
+                continue
+            left = self.decide[node][codes[self.col[node]][idx]]
+            stack += [(self.left[node], idx[left]), (self.right[node], idx[~left])]
+        return out
+
+
+def _code_classes(splits):
+    # Group a column's codes that every split in splits sends the same way:
+    # (class of each code, one representative code per class)
+    _, representative, inverse = np.unique(np.array(splits).T, axis=0, return_index=True, return_inverse=True)
+    return inverse.reshape(-1), representative
+
+
+def _table_size(trees):
+    by_col = {}
+    for tree in trees:
+        for col, decide in tree.splits():
+            by_col.setdefault(col, []).append(decide)
+    size = 1
+    for splits in by_col.values():
+        size *= len(_code_classes(splits)[1])
+    return size, by_col
+
+
+def _tabulate(trees):
+    # Sum the trees' leaf weights over every distinguishable code combination
+    # of the columns they split on; key = mixed-radix class index per column
+    _, by_col = _table_size(trees)
+    cols = sorted(by_col)
+    classes = [_code_classes(by_col[col]) for col in cols]
+    radix = [len(rep) for _, rep in classes]
+    strides = np.cumprod([1] + radix[:0:-1])[::-1]
+    keys = np.arange(int(np.prod(radix)))
+    codes = {col: rep[(keys // stride) % r] for col, (_, rep), stride, r in zip(cols, classes, strides, radix)}
+    table = sum(tree.evaluate(codes) for tree in trees)
+    luts = [(cls * stride).astype(np.int32) for (cls, _), stride in zip(classes, strides)]
+    return cols, luts, table
+
+
+def compile_artifact(artifact):
+    """Compile a fitted model artifact (see scripts.model_artifact) into a CompiledModel."""
+    preprocessor, classifier = artifact["preprocessor"], artifact["model"]
+    (_, onehot, cat_cols), (_, scaler, num_cols) = [t for t in preprocessor.transformers_ if t[0] != "remainder"]
+    if onehot.drop is not None or getattr(onehot, "_infrequent_enabled", False):
+        raise ValueError("compiling supports plain one-hot encoding only (no drop / infrequent categories)")
+    mean = scaler.mean_ if scaler.mean_ is not None else np.zeros(len(num_cols))
+    scale = scaler.scale_ if scaler.scale_ is not None else np.ones(len(num_cols))
+    # A model trained on CSR input saw unstored zeros as missing: one-hot zeros,
+    # and numeric values equal to the column mean (scaled to exactly 0)
+    sparse = artifact.get("sparse", False)
+
+    booster = json.loads(classifier.get_booster().save_raw("json"))["learner"]
+    if booster["objective"]["name"] != "binary:logistic":
+        raise ValueError(f"unsupported objective {booster['objective']['name']}")
+    base_score = float(booster["learner_model_param"]["base_score"].strip("[]"))
+    raw_trees = booster["gradient_booster"]["model"]["trees"]
+
+    # Encoded feature index -> (raw column index, category index or None)
+    columns = list(cat_cols) + list(num_cols)
+    vocab = [[str(c) for c in cats] for cats in onehot.categories_]
+    features = [(i, k) for i, cats in enumerate(vocab) for k in range(len(cats))]
+    features += [(len(cat_cols) + j, None) for j in range(len(num_cols))]
+    # Out-of-vocabulary values: lumped columns fall back to "Other", others to an all-zero one-hot slot
+    fallback = np.array([cats.index("Other") if "Other" in cats and col in ("country", "source") else len(cats)
+                         for col, cats in zip(cat_cols, vocab)], dtype=np.int32)
+
+    # Raw-unit split points of every numeric column -> its bin edges
+    edges = [set() for _ in num_cols]
+    for tree in raw_trees:
+        for feature, split, child in zip(tree["split_indices"], tree["split_conditions"], tree["left_children"]):
+            raw, category = features[feature]
+            if child != -1 and category is None:
+                j = raw - len(cat_cols)
+                edges[j].add(_fold_threshold(split, mean[j], scale[j]))
+    if sparse:
+        # Give x == mean a bin of its own: [mean, next float after mean)
+        for j, e in enumerate(edges):
+            if e:
+                e.update([mean[j], np.nextafter(mean[j], np.inf)])
+    edges = [np.array(sorted(e), dtype=np.float64) for e in edges]
+
+    trees = []
+    for tree in raw_trees:
+        col, decide = [], []
+        for n, child in enumerate(tree["left_children"]):
+            if child == -1:
+                col.append(-1)
+                decide.append(None)
+                continue
+            raw, category = features[tree["split_indices"][n]]
+            split = np.float32(tree["split_conditions"][n])
+            if category is None:
+                # Bin b holds edges[b-1] <= x < edges[b]; the last bin is "missing"
+                j = raw - len(cat_cols)
+                bin_edge = np.searchsorted(edges[j], _fold_threshold(split, mean[j], scale[j]))
+                go_left = np.arange(len(edges[j]) + 2) <= bin_edge
+                go_left[-1] = bool(tree["default_left"][n])
+                if sparse:
+                    go_left[np.searchsorted(edges[j], mean[j], side="right")] = bool(tree["default_left"][n])
+            else:
+                # The one-hot value is 1 for this category, 0 for other codes and the fallback slot
+                onehot_values = np.zeros(len(vocab[raw]) + 1, dtype=np.float32)
+                onehot_values[category] = 1
+                go_left = onehot_values < split
+                if sparse:
+                    go_left[onehot_values == 0] = bool(tree["default_left"][n])
+            col.append(raw)
+            decide.append(go_left)
+        # Leaf weights are stored in split_conditions
+        trees.append(_Tree(col, decide, tree["left_children"], tree["right_children"], tree["split_conditions"]))
+
+    # First-fit the trees into groups whose leaf-sum tables stay under MAX_TABLE
+    base_margin = np.log(base_score / (1 - base_score))
+    groups = []
+    for tree in trees:
+        if not tree.splits():
+            base_margin += tree.value[0]
+            continue
+        for group in groups:
+            if _table_size(group + [tree])[0] <= MAX_TABLE:
+                group.append(tree)
+                break
+        else:
+            groups.append([tree])
+
+    return CompiledModel(columns, vocab, fallback, edges, base_margin, [_tabulate(group) for group in groups])
+
+
+def export_compiled(model_path=MODEL_PATH, output_path=COMPILED_MODEL_PATH):
+    artifact = load_artifact(model_path)
+    compiled = compile_artifact(artifact)
+    compiled.save(output_path, threshold=float(artifact["threshold"]),
+                  top_countries=[str(c) for c in artifact["top_countries"]],
+                  top_sources=[str(c) for c in artifact["top_sources"]],
+                  high_value_countries=list(artifact["high_value_countries"]))
+    return compiled
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile the fitted pipeline into flat NumPy arrays.")
+    parser.add_argument("--model", default=MODEL_PATH, help="model artifact saved by training")
+    parser.add_argument("--output", default=COMPILED_MODEL_PATH, help="compiled model (.npz)")
+    args = parser.parse_args()
+
+    compiled = export_compiled(args.model, args.output)
+    entries = sum(len(table) for _, _, table in compiled.groups)
+    print(f"Compiled the ensemble into {len(compiled.groups)} tree groups ({entries:,} table entries) "
+          f"over {len(compiled.columns)} raw columns at '{args.output}'")
+
+
+if __name__ == "__main__":
+    main()
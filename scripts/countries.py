@@ -0,0 +1,83 @@
+"""Country name → ISO-3 code table, built once at pipeline time.
+
+GA exports name countries in their own style ("Russia", "Bosnia &
+Herzegovina", "Myanmar (Burma)"), and plotly's choropleth locates
+countries by ISO-3 code. Every distinct country in the raw export is
+resolved here, once: first through the hand-maintained overrides file
+(GA names ``pycountry`` doesn't know), then by ``pycountry`` lookup. The
+result is stored as ``data/country_iso3.csv``. Cleaning attaches it to
+every session as a categorical ``iso3`` column, so nothing downstream
+imports ``pycountry`` or resolves names again.
+
+    python -m scripts.countries                # rebuild the table from the raw export
+
+Names still unresolved are listed; add them to the overrides file.
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+ISO3_TABLE = "data/country_iso3.csv"
+ISO3_OVERRIDES = "data/country_iso3_overrides.csv"
+
+
+def _lookup(name):
+    import pycountry
+
+    try:
+        return pycountry.countries.lookup(name).alpha_3
+    except LookupError:
+        return None
+
+
+def build_iso3_table(countries, overrides_path=ISO3_OVERRIDES):
+    """country → iso3 frame for the distinct names in countries (iso3 missing if unresolved)."""
+    overrides = read_iso3_table(overrides_path)
+    names = sorted(pd.Series(countries).dropna().unique())
+    return pd.DataFrame({
+        "country": names,
+        "iso3": [overrides[name] if name in overrides else _lookup(name) for name in names],
+    })
+
+
+def read_iso3_table(path=ISO3_TABLE):
+    """{country: iso3} for the resolved names of a table (or overrides) CSV."""
+    table = pd.read_csv(path, keep_default_na=False, na_values=[""])
+    return dict(table.dropna(subset=["iso3"]).itertuples(index=False, name=None))
+
+
+def iso3_codes(country, table):
+    """Categorical ISO-3 code per row (missing where the table has none).
+
+    Each distinct country is looked up once; rows only gather the result by
+    category code. The categories are every code in the table, so chunks
+    cleaned separately share one dtype.
+    """
+    country = country if isinstance(country.dtype, pd.CategoricalDtype) else country.astype("category")
+    dtype = pd.CategoricalDtype(sorted(set(table.values())))
+    per_category = pd.Categorical(country.cat.categories.map(table), dtype=dtype).codes
+    codes = np.append(per_category, -1)[country.cat.codes.to_numpy()]  # code -1 (missing country) → missing
+    return pd.Categorical.from_codes(codes, dtype=dtype)
+
+
+def main():
+    from scripts.clean_data import RAW_PATH
+
+    parser = argparse.ArgumentParser(description="Build the country name -> ISO-3 table.")
+    parser.add_argument("--input", default=RAW_PATH, help="raw sessions CSV")
+    parser.add_argument("--overrides", default=ISO3_OVERRIDES, help="GA-specific names resolved by hand")
+    parser.add_argument("--output", default=ISO3_TABLE, help="table CSV")
+    args = parser.parse_args()
+
+    countries = pd.read_csv(args.input, usecols=["country"])["country"]
+    table = build_iso3_table(countries, args.overrides)
+    table.to_csv(args.output, index=False)
+    unresolved = table.loc[table["iso3"].isna(), "country"].tolist()
+    print(f"Resolved {len(table) - len(unresolved)} of {len(table)} countries into '{args.output}'")
+    if unresolved:
+        print(f"No ISO-3 code (add to {args.overrides} if they are countries): {', '.join(unresolved)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Pre-aggregated session cube behind the dashboards.
+
+Sessions are summed once, after cleaning, over every dimension a page can
+group or filter by. Pages then answer their group-bys by rolling the cube
+up, so their cost depends on the number of distinct dimension combinations
+rather than on the number of sessions. Build it with:
+
+    python -m scripts.cube
+
+or, over the date-partitioned store written by incremental ingestion, keep
+one small cube per day and only aggregate the days that are new or changed:
+
+    python -m scripts.cube --partitioned
+"""
+import argparse
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from scripts.aggregate import SESSION_MEASURES, aggregate
+from scripts.schema import conform
+from scripts.session_store import (
+    CLEANED_STORE, SESSIONS_DIR, list_partitions, partition_path, read_sessions, write_sessions,
+)
+
+CUBE_STORE = "data/session_cube.parquet"
+CUBE_PARTITIONS_DIR = "data/cube_partitions"  # one delta cube per ingested day
+
+# Session-duration buckets (seconds); sessions outside 1–3600s get no bucket
+DURATION_BINS = [0, 10, 60, 180, 300, 600, 1200, 3600]
+DURATION_LABELS = ["<10s", "10–60s", "1–3m", "3–5m", "5–10m", "10–20m", "20–60m"]
+DURATION_DTYPE = pd.CategoricalDtype(DURATION_LABELS, ordered=True)
+
+# iso3 follows from country, so it adds no cube rows
+DIMENSIONS = ["date", "devicecategory", "country", "iso3", "source", "funnel_stage", "duration_bucket"]
+MEASURES = ["sessions", "conversions", "revenue"]
+CUBE_MEASURES = {measure: (measure, "sum") for measure in MEASURES}  # measures roll up by summing
+SESSION_COLUMNS = ["date", "devicecategory", "country", "iso3", "source", "funnel_stage",
+                   "timeonsite", "converted", "revenue"]
+
+
+def duration_buckets(timeonsite):
+    # Drop unrealistic durations (outside 1–3600s) so they don't skew the buckets
+    realistic = timeonsite.where(timeonsite.between(1, 3600))
+    return pd.cut(realistic, bins=DURATION_BINS, labels=DURATION_LABELS, right=False)
+
+
+def build_cube(sessions, workers=None):
+    """Aggregate a session frame into cube rows (one per dimension combination)."""
+    keyed = sessions.assign(duration_bucket=duration_buckets(sessions["timeonsite"]))
+    return aggregate(keyed, DIMENSIONS, SESSION_MEASURES, dropna=False, workers=workers).reset_index()
+
+
+def merge_cubes(cubes):
+    """Combine partial cubes (e.g. one per chunk) into one; measures are additive."""
+    merged = pd.concat(cubes, ignore_index=True)
+    # Chunks with different category sets concatenate to object; re-encode them
+    for dim in ["devicecategory", "country", "iso3", "source"]:
+        merged[dim] = merged[dim].astype("category")
+    merged["funnel_stage"] = merged["funnel_stage"].astype(cubes[0]["funnel_stage"].dtype)
+    merged["duration_bucket"] = merged["duration_bucket"].astype(DURATION_DTYPE)
+    return aggregate(merged, DIMENSIONS, CUBE_MEASURES, dropna=False, workers=1).reset_index()
+
+
+def select(cube, filters=None, index=None):
+    """Cube rows matching `filters`, a mapping of dimension -> values to keep,
+    e.g. ``{"devicecategory": ["desktop"], "country": ["United States"]}``.
+
+    With a FilterIndex over the cube the rows are resolved through the index.
+    `cube` may also be a query object (see scripts.duckdb_cube) that applies
+    the filters itself; select, rollup and total then delegate to it.
+    """
+    if not isinstance(cube, pd.DataFrame):
+        return cube.select(filters)
+    if index is not None:
+        rows = index.select(filters or {})
+        return cube if rows is None else cube.iloc[rows]
+    if not filters:
+        return cube
+    mask = np.ones(len(cube), dtype=bool)
+    for dim, values in filters.items():
+        mask &= cube[dim].isin(values).to_numpy()
+    return cube[mask]
+
+
+def rollup(cube, by, filters=None, observed=True):
+    """Sum the cube's measures over `by` for the rows matching `filters`.
+
+    Rows without a value for a `by` dimension (e.g. no duration bucket) drop out.
+    """
+    if not isinstance(cube, pd.DataFrame):
+        return cube.rollup(by, filters, observed)
+    return aggregate(select(cube, filters), by, CUBE_MEASURES, observed=observed)
+
+
+def total(cube, filters=None):
+    """Grand totals of the measures for the rows matching `filters`."""
+    if not isinstance(cube, pd.DataFrame):
+        return cube.total(filters)
+    return select(cube, filters)[MEASURES].sum()
+
+
+def build_cube_store(store_path=CLEANED_STORE, cube_path=CUBE_STORE, batch_size=1_000_000, workers=None):
+    # Aggregate the session store batch by batch so memory stays bounded
+    parquet = pq.ParquetFile(store_path)
+    partials = [
+        build_cube(conform(batch.to_pandas()), workers)
+        for batch in parquet.iter_batches(batch_size=batch_size, columns=SESSION_COLUMNS)
+    ]
+    cube = merge_cubes(partials)
+    write_sessions(cube, cube_path)
+    return parquet.metadata.num_rows, len(cube)
+
+
+def _newest_mtime(directory):
+    return max(os.stat(f).st_mtime_ns for f in glob.glob(os.path.join(directory, "*.parquet")))
+
+
+def build_partitioned_cube(sessions_dir=SESSIONS_DIR, partitions_dir=CUBE_PARTITIONS_DIR,
+                           cube_path=CUBE_STORE):
+    # Re-aggregate only the days whose session files are newer than their
+    # delta cube, then merge the (small) per-day cubes into the full cube
+    rebuilt, deltas = 0, []
+    for day, session_dir in list_partitions(sessions_dir):
+        delta_path = os.path.join(partition_path(partitions_dir, day), "cube.parquet")
+        if not os.path.exists(delta_path) or os.stat(delta_path).st_mtime_ns < _newest_mtime(session_dir):
+            write_sessions(build_cube(read_sessions(session_dir, columns=SESSION_COLUMNS)), delta_path)
+            rebuilt += 1
+        deltas.append(read_sessions(delta_path))
+    if not deltas:
+        raise FileNotFoundError(f"no date partitions under '{sessions_dir}'")
+
+    cube = merge_cubes(deltas)
+    write_sessions(cube, cube_path)
+    return len(deltas), rebuilt, len(cube)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the pre-aggregated session cube.")
+    parser.add_argument("--input", default=CLEANED_STORE, help="cleaned sessions Parquet store")
+    parser.add_argument("--output", default=CUBE_STORE, help="cube Parquet file")
+    parser.add_argument("--batch-size", type=int, default=1_000_000,
+                        help="sessions aggregated per batch")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processes aggregating each batch (default: all CPUs for batches of "
+                             "1M+ sessions, otherwise in-process)")
+    parser.add_argument("--partitioned", nargs="?", const=SESSIONS_DIR, default=None, metavar="DIR",
+                        help=f"build from a date-partitioned store (default: {SESSIONS_DIR}), "
+                             "re-aggregating only new or changed days")
+    parser.add_argument("--partitions-dir", default=CUBE_PARTITIONS_DIR,
+                        help="where per-day delta cubes are kept in --partitioned mode")
+    args = parser.parse_args()
+
+    if args.partitioned:
+        days, rebuilt, rows = build_partitioned_cube(args.partitioned, args.partitions_dir, args.output)
+        print(f"Merged {days} day(s) ({rebuilt} re-aggregated) into {rows:,} cube rows at '{args.output}'")
+        return
+
+    sessions, rows = build_cube_store(args.input, args.output, args.batch_size, args.workers)
+    print(f"Aggregated {sessions:,} sessions into {rows:,} cube rows at '{args.output}'")
+
+
+if __name__ == "__main__":
+    main()
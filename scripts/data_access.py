@@ -0,0 +1,152 @@
+"""Shared, process-wide cached data access for the Streamlit pages.
+
+Streamlit re-executes a page script on every interaction, but imported
+modules live for the whole server process. Frames loaded here are therefore
+parsed once per file version and shared by every page and every browser
+session. A file version is its (mtime, size) stamp, so when the pipeline
+rewrites a store the next call reloads it and the stale frame is dropped.
+
+Files are read through the compact dtypes of ``scripts.schema`` (CSV
+outputs included), so each cached frame costs a fraction of what plain
+``pd.read_csv`` would keep resident; ``cache_report()`` shows what is cached
+and how much memory it holds.
+
+The Homepage's chart PNGs go through ``load_image`` the same way, downsized
+once to the width Streamlit displays.
+
+Frames returned from this module are shared: treat them as read-only and
+derive new frames (filter, ``assign``, ``copy``) instead of mutating them.
+
+Set ``DASHBOARD_BACKEND=duckdb`` to answer the cube roll-ups with DuckDB
+over the Parquet file instead (``scripts.duckdb_cube``); the cube is then
+never loaded into the server process.
+"""
+import io
+import os
+import threading
+
+import pandas as pd
+
+from scripts.candidates import CandidateIndex
+from scripts.filter_index import FilterIndex
+from scripts.schema import conform, memory_report
+from scripts.cube import CUBE_STORE
+from scripts.session_store import CLEANED_STORE, SCORED_STORE, read_sessions
+
+# "pandas" loads the cube once per process; "duckdb" queries the Parquet file in place
+BACKEND = os.environ.get("DASHBOARD_BACKEND", "pandas")
+
+# Widest image Streamlit displays; st.image downsizes (and re-encodes) wider
+# images on every run, which load_image does once instead
+IMAGE_MAX_WIDTH = 1460
+
+_cache = {}
+_lock = threading.RLock()
+
+
+def file_version(path):
+    """Cheap version stamp for a data file: (mtime in ns, size in bytes)."""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _read(path, columns):
+    if str(path).endswith(".csv"):
+        return conform(pd.read_csv(path, usecols=columns))
+    return read_sessions(path, columns=columns)
+
+
+def _cached(key, path, build):
+    # Return the object cached under key for the current version of path,
+    # building (and replacing any stale entry) if needed. The lock is held
+    # while building so concurrent sessions wait for one build instead of racing.
+    version = file_version(path)
+    with _lock:
+        cached = _cache.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        value = build()
+        _cache[key] = (version, value)
+        return value
+
+
+def load_frame(path, columns=None):
+    """Return the shared frame for path (optionally projected to columns)."""
+    columns = list(columns) if columns is not None else None
+    key = ("frame", os.path.abspath(path), tuple(columns) if columns is not None else None)
+    return _cached(key, path, lambda: _read(path, columns))
+
+
+def load_cube(path=CUBE_STORE):
+    """The cube pages roll up (see scripts.cube.rollup): the shared frame, or
+    with the duckdb backend a DuckDBCube that answers each roll-up in SQL."""
+    if BACKEND == "duckdb":
+        from scripts.duckdb_cube import DuckDBCube
+
+        return _cached(("duckdb", os.path.abspath(path)), path, lambda: DuckDBCube(path))
+    return load_frame(path)
+
+
+def load_filter_index(path, dimensions):
+    """Return the shared FilterIndex over the given dimensions of path's frame.
+
+    With the duckdb backend nothing is indexed: the DuckDBCube itself lists
+    each dimension's values and applies filters in its queries.
+    """
+    if BACKEND == "duckdb":
+        return load_cube(path)
+    key = ("index", os.path.abspath(path), tuple(dimensions))
+    return _cached(key, path, lambda: FilterIndex(load_frame(path), dimensions))
+
+
+def load_candidates(path=SCORED_STORE):
+    """Return the shared CandidateIndex over the scored sessions at path
+    (every session, as written by ``scripts.score``)."""
+    return _cached(("candidates", os.path.abspath(path)), path, lambda: CandidateIndex(load_frame(path)))
+
+
+def load_model(path):
+    """Return the shared model artifact saved at path (see scripts.model_artifact)."""
+    from scripts.model_artifact import load_artifact
+
+    return _cached(("model", os.path.abspath(path)), path, lambda: load_artifact(path))
+
+
+def load_image(path, max_width=IMAGE_MAX_WIDTH):
+    """PNG bytes of the image at path, downsized once to at most max_width pixels."""
+    def build():
+        from PIL import Image
+
+        with open(path, "rb") as f:
+            data = f.read()
+        image = Image.open(io.BytesIO(data))
+        if image.width <= max_width:
+            return data
+        resized = image.resize((max_width, int(image.height * max_width / image.width)), resample=Image.BILINEAR)
+        buffer = io.BytesIO()
+        resized.save(buffer, format="PNG")
+        return buffer.getvalue()
+
+    return _cached(("image", os.path.abspath(path), max_width), path, build)
+
+
+def load_sessions(columns=None, path=CLEANED_STORE):
+    """Cleaned sessions, shared across pages and sessions."""
+    return load_frame(path, columns)
+
+
+def cache_report():
+    """Resident memory of every cached frame: one row per (path, columns) entry."""
+    with _lock:
+        frames = [(key, value) for key, (_, value) in _cache.items() if key[0] == "frame"]
+    rows = [
+        {"path": os.path.relpath(path), "columns": "all" if columns is None else len(columns),
+         "rows": len(df), "MB": memory_report(df).loc["(total)", "MB"]}
+        for (_, path, columns), df in frames
+    ]
+    return pd.DataFrame(rows, columns=["path", "columns", "rows", "MB"])
+
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
@@ -0,0 +1,175 @@
+"""DuckDB query backend for the dashboard roll-ups (optional: ``pip install duckdb``).
+
+    DASHBOARD_BACKEND=duckdb streamlit run Homepage.py
+
+With this backend ``data_access.load_cube`` hands pages a ``DuckDBCube``
+instead of loading the cube into pandas. ``scripts.cube.select``,
+``rollup`` and ``total`` accept it in place of the cube frame, so the pages
+and ``scripts.charts`` are unchanged. Each roll-up becomes one SQL query
+over the Parquet file: filters are a WHERE clause and only the grouped
+dimensions and the measures are read. DuckDB pushes both into the Parquet
+scan (row groups whose statistics rule them out are skipped), and pages only
+ever hold the result rows.
+
+The same queries run directly over a session store, a single file or a
+date-partitioned directory. Sessions are counted and summed in SQL and the
+duration bucket is computed there, so a cube build isn't needed:
+
+    DuckDBCube("data/sessions").rollup(["duration_bucket", "devicecategory"])
+
+Results are the frames ``scripts.cube.rollup`` and ``total`` return for
+the same arguments (same index, dtypes and group order). Revenue sums can
+differ in the last bits, because the summation order differs.
+"""
+import os
+import threading
+
+import pandas as pd
+
+from scripts.cube import DIMENSIONS, DURATION_BINS, DURATION_DTYPE, DURATION_LABELS, MEASURES
+from scripts.funnel import STAGE_DTYPE
+
+# Index dtype of each dimension; plain categoricals take their categories from the data
+DIMENSION_DTYPES = {
+    "date": "datetime64[ns]",
+    "devicecategory": "category",
+    "country": "category",
+    "iso3": "category",
+    "source": "category",
+    "funnel_stage": STAGE_DTYPE,
+    "duration_bucket": DURATION_DTYPE,
+}
+
+# Measure SQL over cube rows and over raw sessions
+CUBE_MEASURE_SQL = {measure: f"SUM({measure})" for measure in MEASURES}
+SESSION_MEASURE_SQL = {"sessions": "COUNT(*)", "conversions": "SUM(converted)", "revenue": "SUM(revenue)"}
+
+_connection = None
+_lock = threading.Lock()
+
+
+def _cursor():
+    # One in-process database; each query gets its own cursor so Streamlit threads don't share one
+    global _connection
+    with _lock:
+        if _connection is None:
+            import duckdb
+
+            _connection = duckdb.connect()
+        return _connection.cursor()
+
+
+def _scan(path):
+    # Partition directories are only a layout; the date column lives in the files
+    pattern = os.path.join(path, "**", "*.parquet") if os.path.isdir(path) else path
+    pattern = pattern.replace("'", "''")
+    return f"read_parquet('{pattern}', hive_partitioning = false)"
+
+
+def duration_bucket_sql(column="timeonsite"):
+    """SQL for scripts.cube.duration_buckets: NULL outside 1–3600s, else the bucket label."""
+    cases = " ".join(
+        f"WHEN {column} < {upper} THEN '{label}'" for upper, label in zip(DURATION_BINS[1:], DURATION_LABELS)
+    )
+    return f"CASE WHEN {column} BETWEEN 1 AND {DURATION_BINS[-1]} THEN CASE {cases} END END"
+
+
+class DuckDBCube:
+    """A cube (or session store) Parquet file, queried in place by DuckDB.
+
+    ``select`` narrows it without reading anything; ``rollup``, ``total``
+    and ``values`` each run one query.
+    """
+
+    def __init__(self, path, filters=(), _meta=None):
+        self.path = path
+        self.filters = tuple(filters)  # (dimension, values) pairs, all applied
+        if _meta is None:
+            columns = _cursor().execute(f"DESCRIBE SELECT * FROM {_scan(path)}").df()["column_name"]
+            is_cube = "sessions" in set(columns)
+            _meta = {
+                "measures": CUBE_MEASURE_SQL if is_cube else SESSION_MEASURE_SQL,
+                "dimensions": {
+                    dim: f'"{dim}"' if is_cube or dim != "duration_bucket" else duration_bucket_sql()
+                    for dim in DIMENSIONS
+                },
+                "values": {},
+            }
+        self._meta = _meta
+
+    # ── SQL ──
+    def _where(self, filters, not_null=()):
+        clauses, params = [], []
+        for dim, values in filters:
+            values = list(values)
+            if set(values) >= set(self.values(dim)):
+                continue  # everything selected: no predicate to push down
+            if not values:
+                clauses.append("FALSE")
+                continue
+            clauses.append(f"{self._meta['dimensions'][dim]} IN ({', '.join('?' * len(values))})")
+            params.extend(str(value) if not isinstance(value, pd.Timestamp) else value for value in values)
+        clauses.extend(f"{self._meta['dimensions'][dim]} IS NOT NULL" for dim in not_null)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def _measures_sql(self):
+        sql = self._meta["measures"]
+        return ", ".join(
+            f"CAST(COALESCE({sql[m]}, 0) AS {'DOUBLE' if m == 'revenue' else 'BIGINT'}) AS {m}" for m in MEASURES
+        )
+
+    def _query(self, sql, params=()):
+        return _cursor().execute(sql, list(params)).df()
+
+    # ── dtypes ──
+    def _dtype(self, dim):
+        dtype = DIMENSION_DTYPES[dim]
+        if isinstance(dtype, str) and dtype == "category":
+            return pd.CategoricalDtype(self.values(dim))
+        return dtype
+
+    def values(self, dim):
+        """Values of dim that occur in the file, in the order the cube's categories have."""
+        cache = self._meta["values"]
+        if dim not in cache:
+            expr = self._meta["dimensions"][dim]
+            found = set(self._query(f"SELECT DISTINCT {expr} AS v FROM {_scan(self.path)} WHERE {expr} IS NOT NULL")["v"])
+            dtype = DIMENSION_DTYPES[dim]
+            if isinstance(dtype, pd.CategoricalDtype):
+                cache[dim] = [value for value in dtype.categories if value in found]
+            else:
+                cache[dim] = sorted(found)
+        return cache[dim]
+
+    # ── queries ──
+    def select(self, filters=None):
+        """This cube narrowed to the rows matching filters (dimension -> values to keep)."""
+        return DuckDBCube(self.path, self.filters + tuple((filters or {}).items()), self._meta)
+
+    def rollup(self, by, filters=None, observed=True):
+        """The measures summed over by, as scripts.cube.rollup returns them."""
+        by = [by] if isinstance(by, str) else list(by)
+        dims = self._meta["dimensions"]
+        where, params = self._where(self.filters + tuple((filters or {}).items()), not_null=by)
+        result = self._query(
+            f"SELECT {', '.join(f'{dims[dim]} AS {dim}' for dim in by)}, {self._measures_sql()} "
+            f"FROM {_scan(self.path)}{where} GROUP BY ALL",
+            params,
+        )
+        result = result.astype({dim: self._dtype(dim) for dim in by}).set_index(by).sort_index()
+        if not observed:
+            # Every combination of the dimensions' values, as groupby(observed=False) reports them
+            dtypes = [self._dtype(dim) for dim in by]
+            levels = [
+                pd.Categorical(dtype.categories, dtype=dtype) if isinstance(dtype, pd.CategoricalDtype)
+                else result.index.get_level_values(dim).unique()
+                for dim, dtype in zip(by, dtypes)
+            ]
+            full = pd.MultiIndex.from_product(levels, names=by) if len(by) > 1 else pd.Index(levels[0], name=by[0])
+            result = result.reindex(full, fill_value=0)
+        return result[MEASURES]
+
+    def total(self, filters=None):
+        """Grand totals of the measures, as scripts.cube.total returns them."""
+        where, params = self._where(self.filters + tuple((filters or {}).items()))
+        return self._query(f"SELECT {self._measures_sql()} FROM {_scan(self.path)}{where}", params).iloc[0]
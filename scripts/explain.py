@@ -0,0 +1,188 @@
+"""SHAP explanations for the conversion model.
+
+Global stage, run after training:
+
+    python -m scripts.explain --rows 2000 --background 100 --workers 2
+
+explains a stratified sample of sessions (by conversion and device, with a
+floor per stratum so rare converters are represented, and weights that undo
+the oversampling) in parallel batches, against a stratified background
+sample (``--background 0`` uses the trees' own cover statistics instead).
+Only per-feature weighted mean |SHAP| is kept and written to
+``outputs/shap_importance.csv``, a small file the dashboard reads without
+importing shap.
+
+Per-session explanations (``explain_sessions``) use XGBoost's built-in exact
+TreeSHAP (``pred_contribs``), so explaining a handful of sessions on demand,
+e.g. rows on the Top Conversion Candidates page, needs no shap import either.
+"""
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from scripts.model_artifact import FEATURES, MODEL_PATH, load_artifact, model_frame
+from scripts.session_store import ENGINEERED_STORE, read_sessions
+
+IMPORTANCE_PATH = "outputs/shap_importance.csv"
+
+STRATA = ["converted", "devicecategory"]
+MIN_PER_STRATUM = 50
+
+
+def feature_names(artifact):
+    """(encoded feature names, raw column of each) for an artifact's preprocessor."""
+    preprocessor = artifact["preprocessor"]
+    names, raw = [], []
+    for name, transformer, columns in preprocessor.transformers_:
+        if name == "remainder":
+            continue
+        if hasattr(transformer, "categories_"):
+            for col, cats in zip(columns, transformer.categories_):
+                names += [f"{col}_{c}" for c in cats]
+                raw += [col] * len(cats)
+        else:
+            names += list(columns)
+            raw += list(columns)
+    return names, raw
+
+
+def stratified_sample(df, n, by=STRATA, min_per_stratum=MIN_PER_STRATUM, seed=42):
+    """Rows of df sampled per stratum (proportionally, with a floor), plus a
+    `weight` column (stratum rows / sampled rows) that undoes the floor."""
+    if n >= len(df):
+        return df.assign(weight=1.0)
+    rng = np.random.default_rng(seed)
+    strata = df.groupby(by, observed=True, dropna=False).indices
+    sizes = np.array([len(rows) for rows in strata.values()])
+    take = np.minimum(sizes, np.maximum(np.round(sizes / sizes.sum() * n), min_per_stratum)).astype(int)
+    picked, weights = [], []
+    for rows, size, k in zip(strata.values(), sizes, take):
+        picked.append(rng.choice(rows, size=k, replace=False))
+        weights.append(np.full(k, size / k))
+    order = np.concatenate(picked)
+    return df.iloc[order].assign(weight=np.concatenate(weights))
+
+
+def _dense(X, sparse):
+    # shap's interventional explainer needs dense input; a model trained on
+    # CSR saw unstored zeros as missing, so restore that as NaN
+    if not sp.issparse(X):
+        return X
+    X = X.toarray()
+    if sparse:
+        X[X == 0] = np.nan
+    return X
+
+
+# ── global stage (worker processes build the explainer once) ──
+_explainer = None
+_sparse = False
+
+
+def _init_worker(model_path, background):
+    import shap
+
+    global _explainer, _sparse
+    artifact = load_artifact(model_path)
+    _sparse = artifact.get("sparse", False)
+    model = artifact["model"]
+    if background is None:
+        _explainer = shap.TreeExplainer(model, feature_perturbation="tree_path_dependent")
+    else:
+        _explainer = shap.TreeExplainer(model, data=background, feature_perturbation="interventional",
+                                        model_output="raw")
+
+
+def _explain_batch(batch):
+    # Weighted sum of |SHAP| per feature for one batch of encoded rows
+    X, weights = batch
+    if _explainer.feature_perturbation == "interventional":
+        X = _dense(X, _sparse)
+    values = _explainer.shap_values(X, check_additivity=False)
+    return np.abs(values).T @ weights, weights.sum()
+
+
+def global_importance(model_path=MODEL_PATH, store_path=ENGINEERED_STORE, rows=2000, background=100,
+                      batch_size=250, workers=1, seed=42):
+    """Weighted mean |SHAP| per encoded feature over a stratified session sample."""
+    artifact = load_artifact(model_path)
+    preprocessor = artifact["preprocessor"]
+    sessions = read_sessions(store_path, columns=FEATURES + ["converted"])
+    sample = stratified_sample(sessions, rows, seed=seed)
+    X = preprocessor.transform(model_frame(sample, artifact))
+    weights = sample["weight"].to_numpy()
+
+    background_X = None
+    if background:
+        background_rows = stratified_sample(sessions, background, seed=seed + 1)
+        background_X = _dense(preprocessor.transform(model_frame(background_rows, artifact)),
+                              artifact.get("sparse", False))
+
+    batches = [(X[i:i + batch_size], weights[i:i + batch_size]) for i in range(0, X.shape[0], batch_size)]
+    if workers <= 1:
+        _init_worker(model_path, background_X)
+        partials = [_explain_batch(b) for b in batches]
+    else:
+        with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                 initargs=(model_path, background_X)) as executor:
+            partials = list(executor.map(_explain_batch, batches))
+
+    total = sum(p[0] for p in partials) / sum(p[1] for p in partials)
+    names, raw = feature_names(artifact)
+    return (
+        pd.DataFrame({"feature": names, "raw_feature": raw, "mean_abs_shap": total})
+        .sort_values("mean_abs_shap", ascending=False, ignore_index=True)
+    ), len(sample)
+
+
+# ── on-demand, per session ──
+def explain_sessions(sessions, artifact):
+    """Exact TreeSHAP contributions (log-odds) of each session's raw features.
+
+    Returns one row per session and raw feature (index = session index), with
+    one-hot contributions summed back onto their column, plus the model's
+    base value under feature "(base)".
+    """
+    import xgboost as xgb
+
+    X = artifact["preprocessor"].transform(model_frame(sessions, artifact))
+    contribs = artifact["model"].get_booster().predict(xgb.DMatrix(X), pred_contribs=True)
+    _, raw = feature_names(artifact)
+    by_raw = pd.DataFrame(contribs[:, :-1], index=sessions.index, columns=raw).T.groupby(level=0, sort=False).sum().T
+    by_raw["(base)"] = contribs[:, -1]
+    return (
+        by_raw.rename_axis(index="session", columns="feature")
+              .stack()
+              .rename("contribution")
+              .reset_index(level="feature")
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Global SHAP importance over a stratified session sample.")
+    parser.add_argument("--model", default=MODEL_PATH, help="model artifact saved by training")
+    parser.add_argument("--input", default=ENGINEERED_STORE, help="engineered sessions store")
+    parser.add_argument("--output", default=IMPORTANCE_PATH, help="mean |SHAP| per feature (CSV)")
+    parser.add_argument("--rows", type=int, default=2000, help="sessions explained")
+    parser.add_argument("--background", type=int, default=100,
+                        help="background sample size (0 = tree-path-dependent, no background)")
+    parser.add_argument("--batch-size", type=int, default=250, help="sessions per explained batch")
+    parser.add_argument("--workers", type=int, default=1, help="explaining processes")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    importance, explained = global_importance(args.model, args.input, args.rows, args.background,
+                                              args.batch_size, args.workers, args.seed)
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    importance.to_csv(args.output, index=False)
+    print(f"Explained {explained:,} sessions; top features:")
+    print(importance.head(10).to_string(index=False))
+    print(f"Saved mean |SHAP| per feature to '{args.output}'")
+
+
+if __name__ == "__main__":
+    main()
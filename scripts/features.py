@@ -0,0 +1,117 @@
+"""Session features for the conversion model, derived from cleaned GA fields.
+
+The same derivations are used on stored sessions (the ``engineer`` pipeline
+stage), in batch scoring and on raw sessions sent to the online scoring
+service, so a session scores the same either way. Everything is computed on
+whole columns: bins by ``searchsorted``, the device × source interaction
+from the two columns' category codes (only the distinct pairs are ever
+formatted as strings) and the high-value flag by a lookup on country codes.
+
+    python -m scripts.features --input data/cleaned_sessions.parquet --output data/engineered_sessions.parquet
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from scripts.session_store import CLEANED_STORE, ENGINEERED_STORE, read_sessions, write_sessions
+
+# Raw per-session fields the derived features are computed from
+RAW_FIELDS = ["devicecategory", "source", "country", "pageviews", "timeonsite"]
+DERIVED_FIELDS = ["is_bounce", "session_bin", "pageviews_per_minute", "device_source_combo", "high_value_region"]
+
+BOUNCE_SECONDS = 10
+# Right-inclusive session-length bins (seconds)
+SESSION_BIN_EDGES = [-np.inf, 10, 60, 300, 1200, np.inf]
+SESSION_BIN_LABELS = ["<10s", "10s–1m", "1–5m", "5–20m", ">20m"]
+SESSION_BIN_DTYPE = pd.CategoricalDtype(SESSION_BIN_LABELS, ordered=True)
+
+
+def high_value_countries(sessions):
+    """Countries with at least one historical conversion."""
+    converted = sessions.loc[sessions["converted"] == 1, "country"]
+    return sorted(converted.astype(str).unique())
+
+
+def _categorical(values):
+    # Categorical columns are used as they are; anything else is factorized once
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.array
+    return pd.Categorical(values)
+
+
+def session_bins(timeonsite):
+    """Categorical session-length bin of each session (missing stays missing)."""
+    seconds = np.asarray(timeonsite, dtype=float)
+    codes = np.searchsorted(np.asarray(SESSION_BIN_EDGES[1:-1], dtype=float), seconds, side="left")
+    codes[np.isnan(seconds)] = -1
+    return pd.Categorical.from_codes(codes, dtype=SESSION_BIN_DTYPE)
+
+
+def combine_categories(left, right, sep="_"):
+    """Categorical "<left><sep><right>" per row, built from the category codes.
+
+    Only pairs that occur become categories; a row missing either side is missing.
+    """
+    left, right = _categorical(left), _categorical(right)
+    n_right = len(right.categories)
+    valid = (left.codes >= 0) & (right.codes >= 0)
+    pair = left.codes.astype(np.int64) * n_right + right.codes
+
+    present = np.flatnonzero(np.bincount(pair[valid], minlength=len(left.categories) * n_right))
+    remap = np.full(len(left.categories) * n_right, -1, dtype=np.int64)
+    remap[present] = np.arange(len(present))
+    labels = [f"{left.categories[p // n_right]}{sep}{right.categories[p % n_right]}" for p in present]
+    # Rows missing a side look up slot 0 (their code is -1 anyway); with no
+    # categories on a side there are no pairs, so every row is missing
+    codes = np.where(valid, remap[np.where(valid, pair, 0)], -1) if len(remap) else np.full(len(pair), -1)
+    return pd.Categorical.from_codes(codes, categories=labels)
+
+
+def in_values(values, allowed):
+    """int8 flag per row: is the value in `allowed` (a lookup per category, not per row)."""
+    values = _categorical(values)
+    flag = np.append(values.categories.astype(str).isin(allowed), False)  # code -1 (missing) → 0
+    return flag[values.codes].astype("int8")
+
+
+def add_features(sessions, high_value):
+    """sessions with is_bounce, session_bin, pageviews_per_minute,
+    device_source_combo and high_value_region added."""
+    timeonsite = sessions["timeonsite"].to_numpy(dtype=float)
+    return sessions.assign(
+        is_bounce=(timeonsite < BOUNCE_SECONDS).astype("int8"),
+        session_bin=session_bins(timeonsite),
+        # The epsilon keeps zero-length sessions finite
+        pageviews_per_minute=sessions["pageviews"].to_numpy(dtype=float) / (timeonsite / 60 + 1e-6),
+        device_source_combo=combine_categories(sessions["devicecategory"], sessions["source"]),
+        high_value_region=in_values(sessions["country"], high_value),
+    )
+
+
+def engineer_sessions(input_path=CLEANED_STORE, output_path=ENGINEERED_STORE, csv_path=None):
+    """Derive the model features for every cleaned session; returns the session count."""
+    sessions = read_sessions(input_path)
+    engineered = add_features(sessions, high_value_countries(sessions))
+    write_sessions(engineered, output_path)
+    if csv_path:
+        engineered.to_csv(csv_path, index=False)
+    return len(engineered)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Derive the model features from cleaned sessions.")
+    parser.add_argument("--input", default=CLEANED_STORE, help="cleaned sessions store")
+    parser.add_argument("--output", default=ENGINEERED_STORE, help="engineered sessions Parquet store")
+    parser.add_argument("--csv", nargs="?", const="data/engineered_sessions.csv", default=None,
+                        help="also export a CSV copy (default path: data/engineered_sessions.csv)")
+    args = parser.parse_args()
+
+    rows = engineer_sessions(args.input, args.output, args.csv)
+    print(f"Engineered features for {rows:,} sessions saved to '{args.output}'")
+    if args.csv:
+        print(f"CSV copy saved to '{args.csv}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Inverted indexes for fast multi-dimension filtering.
+
+For every indexed dimension the index keeps, per distinct value, the sorted
+ids of the rows holding that value (one stable argsort of the category
+codes, sliced by per-value offsets). A filter such as "device in {desktop}
+and country in {US, CA}" then resolves without scanning the frame:
+
+* dimensions where every value is selected impose no restriction;
+* the most selective remaining dimension supplies the candidate row ids
+  (the union of its selected posting lists);
+* the other dimensions are intersected in by one lookup of the candidates'
+  combined (all-dimension) key in an "allowed" bitmap over the key space,
+  or per-dimension lookups when that key space is too large.
+
+Build one index per dataset version (see ``scripts.data_access``) and reuse
+it for every filter change.
+"""
+import numpy as np
+import pandas as pd
+
+
+# Largest combined key space for which a single "allowed" bitmap is built
+MAX_KEY_SPACE = 1 << 24
+
+
+class FilterIndex:
+    def __init__(self, df, dimensions):
+        self.size = len(df)
+        id_dtype = np.int32 if self.size < 2**31 else np.int64
+        self._dims = {}
+        for dim in dimensions:
+            values = df[dim]
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.astype("category")
+            # Shift codes by one so missing values (code -1) get their own slot 0
+            codes = values.cat.codes.to_numpy() + 1
+            order = np.argsort(codes, kind="stable").astype(id_dtype)
+            counts = np.bincount(codes, minlength=len(values.cat.categories) + 1)
+            offsets = np.concatenate([[0], np.cumsum(counts)])
+            self._dims[dim] = (values.cat.categories, codes, order, offsets, counts)
+
+        # Combined key: one mixed-radix code per row over all dimensions
+        self._shape = tuple(len(entry[4]) for entry in self._dims.values())
+        self._keys = None
+        if 0 < np.prod(self._shape, dtype=np.float64) <= MAX_KEY_SPACE:
+            self._keys = np.zeros(self.size, dtype=np.int32)
+            for entry, radix in zip(self._dims.values(), self._shape):
+                self._keys *= radix
+                self._keys += entry[1]
+
+    def values(self, dim):
+        """Distinct values of dim that occur in at least one row."""
+        categories, _, _, _, counts = self._dims[dim]
+        return categories[counts[1:] > 0].tolist()
+
+    def _selected_codes(self, dim, values):
+        categories = self._dims[dim][0]
+        return categories.get_indexer(list(values)) + 1
+
+    def rows(self, dim, values):
+        """Sorted ids of the rows whose dim is one of values."""
+        codes = self._selected_codes(dim, values)
+        return self._rows(dim, np.unique(codes[codes > 0]))
+
+    def _rows(self, dim, codes):
+        _, _, order, offsets, counts = self._dims[dim]
+        if len(codes) == 0:
+            return order[:0]
+        if len(codes) == 1:
+            return order[offsets[codes[0]]:offsets[codes[0] + 1]]
+        if counts[codes].sum() * 16 < self.size:
+            # Few matches: merging the short posting lists beats a full bitmap
+            return np.sort(np.concatenate([order[offsets[c]:offsets[c + 1]] for c in codes]))
+        mask = np.zeros(self.size, dtype=bool)
+        for c in codes:
+            mask[order[offsets[c]:offsets[c + 1]]] = True
+        return np.flatnonzero(mask)
+
+    def select(self, filters):
+        """Sorted ids of the rows matching every dimension's selected values,
+        or None when the filters select everything."""
+        restricted = []
+        for dim, values in filters.items():
+            _, _, _, _, counts = self._dims[dim]
+            codes = self._selected_codes(dim, values)
+            codes = np.unique(codes[codes > 0])
+            present = np.flatnonzero(counts)  # includes the missing slot, never selectable
+            if np.isin(present, codes).all():
+                continue  # every occurring value selected: no restriction
+            restricted.append((counts[codes].sum(), dim, codes))
+        if not restricted:
+            return None
+
+        # Start from the most selective dimension, then intersect the others
+        restricted.sort(key=lambda r: r[0])
+        _, dim, codes = restricted[0]
+        ids = self._rows(dim, codes)
+        if len(restricted) == 1:
+            return ids
+
+        allowed = {dim: self._allowed(dim, codes) for _, dim, codes in restricted[1:]}
+        if self._keys is not None:
+            # Outer product of the per-dimension bitmaps, looked up by combined key
+            combined = np.ones(self._shape, dtype=bool)
+            for axis, name in enumerate(self._dims):
+                if name in allowed:
+                    shape = [1] * len(self._shape)
+                    shape[axis] = -1
+                    combined &= allowed[name].reshape(shape)
+            return ids[combined.ravel()[self._keys[ids]]]
+        for dim, dim_allowed in allowed.items():
+            ids = ids[dim_allowed[self._dims[dim][1][ids]]]
+        return ids
+
+    def _allowed(self, dim, codes):
+        allowed = np.zeros(len(self._dims[dim][4]), dtype=bool)
+        allowed[codes] = True
+        return allowed
@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+
+# Funnel stages, in order, and the pageview thresholds that separate them.
+# A session with exactly STAGE_EDGES[0] pageviews bounced; any other session
+# falls into the last stage whose lower edge it reaches
+# (<5 → Browsed, 5–9 → Engaged, 10+ → Deep Engagement).
+FUNNEL_STAGES = ("Bounced", "Browsed", "Engaged", "Deep Engagement")
+STAGE_EDGES = (0, 5, 10)
+
+# Ordered categorical shared by the cleaning step and every dashboard
+STAGE_DTYPE = pd.CategoricalDtype(FUNNEL_STAGES, ordered=True)
+
+# Stages where low conversion counts as a "silent leak"
+ENGAGED_STAGES = FUNNEL_STAGES[2:]
+
+
+def classify_stages(pageviews, edges=STAGE_EDGES, labels=FUNNEL_STAGES):
+    """Vectorized funnel-stage binning of a pageviews column."""
+    if len(labels) != len(edges) + 1:
+        raise ValueError("need exactly one more stage label than stage edges")
+
+    pv = np.asarray(pageviews, dtype=float)
+    codes = np.searchsorted(np.asarray(edges[1:], dtype=float), pv, side='right') + 1
+    codes[pv == edges[0]] = 0
+
+    dtype = STAGE_DTYPE if tuple(labels) == FUNNEL_STAGES else pd.CategoricalDtype(labels, ordered=True)
+    stages = pd.Categorical.from_codes(codes, dtype=dtype)
+    if isinstance(pageviews, pd.Series):
+        return pd.Series(stages, index=pageviews.index, name='funnel_stage')
+    return stages
@@ -0,0 +1,92 @@
+"""Persisted conversion-model artifact shared by training and scoring.
+
+Training (``scripts/xgboost_model.py``) saves the fitted preprocessor, the
+classifier, the tuned decision threshold, the country/source vocabularies
+the model was fitted on and the high-value countries behind
+``high_value_region``. Scoring loads that artifact instead of retraining.
+Nothing here imports matplotlib, seaborn or shap, so the scoring path
+never pulls in plotting libraries. A compiled artifact (``.npz``, see
+``scripts.compiled_model``) loads through the same functions without
+importing sklearn or xgboost either.
+"""
+import os
+
+import joblib
+
+MODEL_PATH = "models/conversion_model.joblib"
+
+CATEGORICAL_COLS = ["devicecategory", "source", "country", "session_bin", "device_source_combo"]
+NUMERICAL_COLS = ["pageviews", "timeonsite", "is_bounce", "pageviews_per_minute", "high_value_region"]
+FEATURES = [
+    "devicecategory", "source", "country",
+    "pageviews", "timeonsite",
+    "is_bounce", "session_bin",
+    "pageviews_per_minute", "device_source_combo",
+    "high_value_region"
+]
+
+# Countries and sources outside the top N are lumped into "Other"
+TOP_N = 10
+
+
+def top_values(series, n=TOP_N):
+    """The n most frequent values of series (every occurring value if n is None)."""
+    counts = series.value_counts()
+    return (counts[counts > 0] if n is None else counts.nlargest(n)).index.tolist()
+
+
+def lump_rare(series, keep):
+    """Replace values not in keep with "Other" (as a categorical)."""
+    series = series.astype("category")
+    if "Other" not in series.cat.categories:
+        series = series.cat.add_categories("Other")
+    return series.where(series.isin(keep), "Other")
+
+
+def model_frame(df, artifact):
+    """The model's input columns of df, with rare countries/sources lumped like in training.
+
+    Sessions that only carry the raw fields (e.g. the cleaned store) get the
+    derived features computed by ``scripts.features``, exactly as in training.
+    """
+    if "high_value_region" not in df.columns:
+        from scripts.features import add_features
+
+        df = add_features(df, artifact["high_value_countries"])
+    lumped = df.assign(country=lump_rare(df["country"], artifact["top_countries"]),
+                       source=lump_rare(df["source"], artifact["top_sources"]))
+    return lumped[CATEGORICAL_COLS + NUMERICAL_COLS]
+
+
+def predict_proba(artifact, X):
+    """Conversion probability for each row of a model frame."""
+    if artifact["preprocessor"] is None:
+        # Compiled model: the encoding is folded into the trees
+        return artifact["model"].predict_proba(X)
+    return artifact["model"].predict_proba(artifact["preprocessor"].transform(X))[:, 1]
+
+
+def save_artifact(preprocessor, model, threshold, top_countries, top_sources, high_value_countries,
+                  sparse=False, path=MODEL_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    joblib.dump({
+        "preprocessor": preprocessor,
+        "model": model,
+        "threshold": float(threshold),
+        "top_countries": list(top_countries),
+        "top_sources": list(top_sources),
+        "high_value_countries": list(high_value_countries),
+        # Trained on CSR input: unstored (zero) entries were seen as missing
+        "sparse": bool(sparse),
+    }, path)
+
+
+def load_artifact(path=MODEL_PATH):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"no model artifact at '{path}'; train one with `python -m scripts.xgboost_model`")
+    if str(path).endswith(".npz"):
+        from scripts.compiled_model import CompiledModel
+
+        model, meta = CompiledModel.load(path)
+        return {"preprocessor": None, "model": model, **meta}
+    return joblib.load(path)
@@ -0,0 +1,306 @@
+"""Content-hash build graph for the whole pipeline.
+
+    python -m scripts.pipeline                 # bring every stage up to date
+    python -m scripts.pipeline charts explain  # just these stages (and what they depend on)
+    python -m scripts.pipeline --dry-run       # show what is stale
+    python -m scripts.pipeline --force train   # rerun a stage even if it is fresh
+
+Each stage declares the command it runs and the files it reads and writes
+(``STAGES``); a stage's upstream stages are the ones writing its inputs. A
+stage's fingerprint hashes its command line (the parameters) with the
+content of every input and of the code it runs: the stage's module and every
+``scripts.*`` module it imports, found by walking the imports (``code_inputs``),
+so a new import can't drop out of the fingerprint. It reruns only when the
+fingerprint differs from the last successful run or an output is missing,
+so rewriting a file with identical content doesn't cascade downstream.
+
+Stages whose upstream stages are finished run in parallel (``--jobs``), each
+in its own process with output captured under ``.pipeline/logs/``. The run
+ends with a per-stage status and timing report.
+"""
+import argparse
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from scripts.clean_data import RAW_PATH
+from scripts.compiled_model import COMPILED_MODEL_PATH
+from scripts.countries import ISO3_OVERRIDES, ISO3_TABLE
+from scripts.cube import CUBE_STORE
+from scripts.explain import IMPORTANCE_PATH
+from scripts.model_artifact import MODEL_PATH
+from scripts.render_charts import OUTPUT_DIR as CHARTS_DIR
+from scripts.charts import CHARTS
+from scripts.score import SCORED_STORE, TOP_SCORED_STORE
+from scripts.session_store import CLEANED_STORE, ENGINEERED_STORE
+
+STATE_DIR = ".pipeline"
+STATE_PATH = os.path.join(STATE_DIR, "state.json")
+LOG_DIR = os.path.join(STATE_DIR, "logs")
+
+# name → command (run as `python -m ...` from the repo root), data inputs and outputs;
+# the code inputs are derived from the command's module (see code_inputs)
+STAGES = {
+    "countries": {
+        "cmd": ["scripts.countries", "--input", RAW_PATH, "--overrides", ISO3_OVERRIDES, "--output", ISO3_TABLE],
+        "inputs": [RAW_PATH, ISO3_OVERRIDES],
+        "outputs": [ISO3_TABLE],
+    },
+    "clean": {
+        "cmd": ["scripts.clean_data", "--input", RAW_PATH, "--output", CLEANED_STORE, "--iso3-table", ISO3_TABLE],
+        "inputs": [RAW_PATH, ISO3_TABLE],
+        "outputs": [CLEANED_STORE],
+    },
+    "engineer": {
+        "cmd": ["scripts.features", "--input", CLEANED_STORE, "--output", ENGINEERED_STORE],
+        "inputs": [CLEANED_STORE],
+        "outputs": [ENGINEERED_STORE],
+    },
+    "cube": {
+        "cmd": ["scripts.cube", "--input", CLEANED_STORE, "--output", CUBE_STORE],
+        "inputs": [CLEANED_STORE],
+        "outputs": [CUBE_STORE],
+    },
+    "charts": {
+        "cmd": ["scripts.render_charts", "--cube", CUBE_STORE],
+        "inputs": [CUBE_STORE],
+        "outputs": [os.path.join(CHARTS_DIR, f"{name}.png") for name in CHARTS],
+    },
+    "train": {
+        "cmd": ["scripts.xgboost_model"],
+        "inputs": [ENGINEERED_STORE],
+        "outputs": [MODEL_PATH, "outputs/session_predictions.csv", "outputs/top_10pct_sessions.csv",
+                    "outputs/feature_importance.png", "outputs/lift_chart.png"],
+    },
+    "compile": {
+        "cmd": ["scripts.compiled_model", "--model", MODEL_PATH, "--output", COMPILED_MODEL_PATH],
+        "inputs": [MODEL_PATH],
+        "outputs": [COMPILED_MODEL_PATH],
+    },
+    "explain": {
+        "cmd": ["scripts.explain", "--model", MODEL_PATH, "--input", ENGINEERED_STORE, "--output", IMPORTANCE_PATH],
+        "inputs": [MODEL_PATH, ENGINEERED_STORE],
+        "outputs": [IMPORTANCE_PATH],
+    },
+    "score": {
+        "cmd": ["scripts.score", "--input", ENGINEERED_STORE, "--output", SCORED_STORE, "--model", MODEL_PATH,
+                "--top-pct", "10", "--top-output", TOP_SCORED_STORE],
+        "inputs": [MODEL_PATH, ENGINEERED_STORE],
+        "outputs": [SCORED_STORE, TOP_SCORED_STORE],
+    },
+}
+
+
+# ── graph ──
+def upstream(stages=STAGES):
+    """{stage: set of stages writing one of its inputs}."""
+    writer = {out: name for name, stage in stages.items() for out in stage["outputs"]}
+    return {
+        name: {writer[path] for path in stage["inputs"] if path in writer and writer[path] != name}
+        for name, stage in stages.items()
+    }
+
+
+def with_upstream(targets, deps):
+    """targets plus everything they (transitively) depend on."""
+    selected, todo = set(), list(targets)
+    while todo:
+        name = todo.pop()
+        if name not in selected:
+            selected.add(name)
+            todo.extend(deps[name])
+    return selected
+
+
+# ── fingerprints ──
+def _file_hash(path, cache):
+    # Hashes are cached by (mtime, size) so unchanged files are not re-read
+    stat = os.stat(path)
+    stamp = [stat.st_mtime_ns, stat.st_size]
+    cached = cache.get(path)
+    if cached and cached[:2] == stamp:
+        return cached[2]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    cache[path] = stamp + [digest.hexdigest()]
+    return digest.hexdigest()
+
+
+def content_hash(path, cache):
+    """Content hash of a file, or of every file under a directory (by relative path)."""
+    if not os.path.isdir(path):
+        return _file_hash(path, cache)
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            full = os.path.join(root, name)
+            digest.update(os.path.relpath(full, path).encode())
+            digest.update(_file_hash(full, cache).encode())
+    return digest.hexdigest()
+
+
+def code_inputs(module):
+    """Source files of module and of every ``scripts.*`` module it imports,
+    transitively (imports inside functions included)."""
+    found, todo = set(), [module]
+    while todo:
+        path = todo.pop().replace(".", "/") + ".py"
+        if path in found or not os.path.exists(path):
+            continue  # `from scripts.x import name` also queues scripts.x.name, which isn't a module
+        found.add(path)
+        with open(path) as f:
+            tree = ast.parse(f.read(), path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names = [node.module] + [f"{node.module}.{alias.name}" for alias in node.names]
+            else:
+                continue
+            todo.extend(name for name in names if name.split(".")[0] == "scripts")
+    return sorted(found)
+
+
+def fingerprint(stage, cache):
+    digest = hashlib.sha256()
+    digest.update(json.dumps(stage["cmd"]).encode())
+    for path in sorted(stage["inputs"] + code_inputs(stage["cmd"][0])):
+        digest.update(path.encode())
+        digest.update(content_hash(path, cache).encode())
+    return digest.hexdigest()[:16]
+
+
+def read_state(path=STATE_PATH):
+    if not os.path.exists(path):
+        return {"stages": {}, "files": {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_state(state, path=STATE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(f"{path}.tmp", path)
+
+
+def is_stale(name, stage, state):
+    """(stale?, fingerprint) for a stage whose inputs exist."""
+    fp = fingerprint(stage, state["files"])
+    missing = [path for path in stage["outputs"] if not os.path.exists(path)]
+    return bool(missing) or state["stages"].get(name) != fp, fp
+
+
+# ── running ──
+def run_stage(name, stage, log_dir=LOG_DIR):
+    # Runs in a thread: the stage itself is a separate Python process
+    os.makedirs(log_dir, exist_ok=True)
+    log_path = os.path.join(log_dir, f"{name}.log")
+    start = time.perf_counter()
+    with open(log_path, "w") as log:
+        returncode = subprocess.call(
+            [sys.executable, "-m", *stage["cmd"]], stdout=log, stderr=subprocess.STDOUT,
+            env={**os.environ, "MPLBACKEND": "Agg"},  # training plots go to a non-interactive backend
+        )
+    return returncode, time.perf_counter() - start, log_path
+
+
+def _tail(path, lines=15):
+    with open(path, errors="replace") as f:
+        return "".join(f.readlines()[-lines:])
+
+
+def run_pipeline(targets=None, jobs=None, force=(), dry_run=False, stages=STAGES):
+    """Run the stale stages needed for targets (default: all).
+
+    Returns {stage: (status, seconds)}, status one of ran / fresh / stale
+    (dry run) / failed / blocked (an upstream stage failed).
+    """
+    deps = upstream(stages)
+    selected = with_upstream(targets or stages, deps)
+    state = read_state()
+    report = {}
+    pending = {name for name in stages if name in selected}
+    running = {}
+
+    def ready(name):
+        return all(dep in report for dep in deps[name] if dep in selected)
+
+    with ThreadPoolExecutor(jobs or os.cpu_count() or 1) as executor:
+        while pending or running:
+            for name in sorted(pending):
+                if not ready(name):
+                    continue
+                pending.discard(name)
+                if any(report[dep][0] in ("failed", "blocked") for dep in deps[name] if dep in report):
+                    report[name] = ("blocked", 0.0)
+                    continue
+                upstream_changed = any(report[dep][0] in ("ran", "stale") for dep in deps[name] if dep in report)
+                if dry_run and upstream_changed:
+                    # inputs will change once upstream runs; can't fingerprint them yet
+                    report[name] = ("stale", 0.0)
+                    continue
+                stale, fp = is_stale(name, stages[name], state)
+                if not stale and name not in force:
+                    report[name] = ("fresh", 0.0)
+                elif dry_run:
+                    report[name] = ("stale", 0.0)
+                else:
+                    print(f"  {name:10s} started")
+                    running[executor.submit(run_stage, name, stages[name])] = (name, fp)
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, fp = running.pop(future)
+                returncode, seconds, log_path = future.result()
+                if returncode == 0:
+                    # Fingerprint inputs as they were when the stage started
+                    state["stages"][name] = fp
+                    write_state(state)
+                    report[name] = ("ran", seconds)
+                    print(f"  {name:10s} finished in {seconds:.1f}s")
+                else:
+                    report[name] = ("failed", seconds)
+                    print(f"  {name:10s} FAILED after {seconds:.1f}s (exit {returncode}); "
+                          f"end of {log_path}:\n{_tail(log_path)}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the stale pipeline stages.")
+    parser.add_argument("targets", nargs="*", metavar="STAGE",
+                        help=f"stages to bring up to date, with their upstream stages (default: all of "
+                             f"{', '.join(STAGES)})")
+    parser.add_argument("--jobs", type=int, default=None, help="stages run at once (default: CPU count)")
+    parser.add_argument("--force", nargs="+", default=[], choices=list(STAGES), metavar="STAGE",
+                        help="rerun these stages even if fresh")
+    parser.add_argument("--dry-run", action="store_true", help="only report which stages are stale")
+    args = parser.parse_args()
+    unknown = set(args.targets) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(sorted(unknown))}")
+
+    start = time.perf_counter()
+    report = run_pipeline(args.targets or None, args.jobs, set(args.force), args.dry_run)
+    print(f"\n{'stage':10s} {'status':8s} {'seconds':>8s}")
+    for name in STAGES:
+        if name in report:
+            status, seconds = report[name]
+            print(f"{name:10s} {status:8s} {seconds:8.1f}")
+    print(f"Total wall time {time.perf_counter() - start:.1f}s")
+    if any(status == "failed" for status, _ in report.values()):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Render the dashboard charts to the PNGs the Homepage shows, without Streamlit.
+
+    python -m scripts.render_charts                      # stale charts only
+    python -m scripts.render_charts --workers 4 --force  # re-render everything
+    python -m scripts.render_charts --only source_device_heatmap
+
+Aggregates are rolled up here from the session cube with the same code the
+pages use (``scripts.charts``). Each chart's aggregate frame is hashed
+together with its figure code, the styling constants and the render settings; a chart whose PNG
+exists and whose hash matches the one recorded in
+``outputs/.chart_hashes.json`` is skipped. The remaining charts are drawn and
+exported (Plotly + kaleido) in a process pool, one chart per task. A chart
+that fails to render keeps its old PNG and hash and is retried next run.
+
+The country map needs Plotly's world topojson, which kaleido fetches from
+the Plotly CDN; on offline hosts point ``--topojson`` at a local copy.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from scripts.charts import CHARTS, figure_key
+from scripts.cube import CUBE_STORE
+from scripts.session_store import read_sessions
+
+OUTPUT_DIR = "outputs"
+HASHES_NAME = ".chart_hashes.json"
+
+# Export size; figures without a layout height use DEFAULT_HEIGHT
+WIDTH = 1542
+DEFAULT_HEIGHT = 450
+SCALE = 1
+
+
+def chart_hash(name, data, width=WIDTH, scale=SCALE):
+    """Hash of everything a chart's PNG depends on: data, figure code, styling and size."""
+    digest = hashlib.sha256()
+    digest.update(figure_key(name, data).encode())
+    digest.update(f"{width}x{scale}".encode())
+    return digest.hexdigest()[:16]
+
+
+def read_hashes(output_dir):
+    path = os.path.join(output_dir, HASHES_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_hashes(output_dir, hashes):
+    path = os.path.join(output_dir, HASHES_NAME)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(hashes, f, indent=2, sort_keys=True)
+    os.replace(f"{path}.tmp", path)
+
+
+def _init_worker(topojson):
+    if topojson:
+        import plotly.io as pio
+
+        pio.kaleido.scope.topojson = topojson
+
+
+def render(name, data, path, width=WIDTH, scale=SCALE):
+    # Runs in a worker: draw the figure and export it next to the target, then
+    # swap it in so the Homepage never reads a half-written PNG
+    start = time.perf_counter()
+    fig = CHARTS[name][1](data)
+    tmp = f"{path}.tmp.png"
+    fig.write_image(tmp, format="png", width=width, height=fig.layout.height or DEFAULT_HEIGHT, scale=scale)
+    os.replace(tmp, path)
+    return name, time.perf_counter() - start
+
+
+def render_charts(cube_path=CUBE_STORE, output_dir=OUTPUT_DIR, names=None, workers=None, force=False,
+                  width=WIDTH, scale=SCALE, topojson=None):
+    """Render the stale charts among `names` (default: all).
+
+    Returns ({name: seconds} for the charts rendered, {name: error} for those that failed).
+    """
+    cube = read_sessions(cube_path)
+    hashes = read_hashes(output_dir)
+    todo = {}
+    for name in names or CHARTS:
+        data = CHARTS[name][0](cube)
+        digest = chart_hash(name, data, width, scale)
+        path = os.path.join(output_dir, f"{name}.png")
+        if not force and hashes.get(name) == digest and os.path.exists(path):
+            print(f"  {name:32s} unchanged, skipped")
+            continue
+        todo[name] = (data, path, digest)
+
+    timings, failures = {}, {}
+    if not todo:
+        return timings, failures
+    os.makedirs(output_dir, exist_ok=True)
+    with ProcessPoolExecutor(workers or min(len(todo), os.cpu_count() or 1),
+                             initializer=_init_worker, initargs=(topojson,)) as executor:
+        futures = {executor.submit(render, name, data, path, width, scale): name
+                   for name, (data, path, _) in todo.items()}
+        for future in as_completed(futures):
+            try:
+                name, seconds = future.result()
+            except Exception as e:
+                failures[futures[future]] = e
+                print(f"  {futures[future]:32s} FAILED: {e}")
+                continue
+            timings[name] = seconds
+            # Record each chart as it lands so an interrupted run keeps its progress
+            hashes[name] = todo[name][2]
+            write_hashes(output_dir, hashes)
+            print(f"  {name:32s} rendered in {seconds:.2f}s")
+    return timings, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the dashboard charts to PNG.")
+    parser.add_argument("--cube", default=CUBE_STORE, help="session cube to aggregate")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--only", nargs="+", choices=sorted(CHARTS), default=None, help="charts to render")
+    parser.add_argument("--workers", type=int, default=None, help="rendering processes (default: one per chart, up to the CPU count)")
+    parser.add_argument("--force", action="store_true", help="re-render charts whose data hasn't changed")
+    parser.add_argument("--width", type=int, default=WIDTH)
+    parser.add_argument("--scale", type=float, default=SCALE)
+    parser.add_argument("--topojson", default=None, help="local Plotly topojson directory or URL (offline hosts)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    timings, failures = render_charts(args.cube, args.output_dir, args.only, args.workers, args.force,
+                                      args.width, args.scale, args.topojson)
+    print(f"Rendered {len(timings)} chart(s) in {time.perf_counter() - start:.2f}s")
+    if failures:
+        raise SystemExit(f"{len(failures)} chart(s) failed: {', '.join(sorted(failures))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Compact column schema shared by every session, cube and prediction loader.
+
+``pd.read_csv`` gives ``object`` strings for the dimension columns and
+64-bit numbers for everything else, and the dashboards keep those frames for
+the life of the server process. Every store and output is therefore read
+(and written) through ``conform``, which casts the known columns to compact
+dtypes: categoricals for dimensions, the smallest unsigned integer that holds
+a count or an id, float32 for model-side ratios and probabilities. Money
+stays float64 so revenue sums don't drift, and 0/1 model features stay int8
+(the same single byte as bool, but they feed the scaler and the compiled
+model as numbers).
+
+Values are validated before they are cast, so a store that no longer fits
+its schema (a negative or fractional count, an id beyond the integer range,
+an unknown funnel stage) fails loudly with ``SchemaError`` instead of
+wrapping around or silently becoming missing.
+
+    python -m scripts.schema data/cleaned_sessions.csv outputs/session_predictions.csv
+
+prints a per-column memory report of each file as pandas reads it and as
+conformed.
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from scripts.funnel import STAGE_DTYPE
+
+SCHEMA = {
+    # sessions
+    "fullvisitorid": "uint64",
+    "visitid": "uint32",            # session start, Unix seconds
+    "visitnumber": "uint16",
+    "date": "datetime64[ns]",
+    "devicecategory": "category",
+    "country": "category",
+    "iso3": "category",             # precomputed from country (scripts/countries.py)
+    "source": "category",
+    "pageviews": "uint16",
+    "timeonsite": "uint32",         # seconds
+    "transactions": "float32",      # missing when the session had none
+    "transactionrevenue": "float64",
+    "converted": "uint8",           # transaction count (0 for most sessions)
+    "revenue": "float64",
+    "funnel_stage": STAGE_DTYPE,
+    # engineered features
+    "is_bounce": "int8",
+    "session_bin": "category",
+    "pageviews_per_minute": "float32",
+    "device_source_combo": "category",
+    "high_value_region": "int8",
+    # cube
+    "duration_bucket": "category",
+    "sessions": "uint32",
+    "conversions": "uint32",
+    # model outputs
+    "p_conversion": "float32",
+    "above_threshold": "int8",
+    "top_10pct_flag": "int8",
+}
+
+
+class SchemaError(ValueError):
+    """A column's values don't fit its declared dtype."""
+
+
+def _check(col, values, dtype):
+    # Raise if casting values to dtype would lose or invent information
+    if isinstance(dtype, pd.CategoricalDtype):
+        if dtype.categories is not None:
+            unknown = set(values.dropna().unique()) - set(dtype.categories)
+            if unknown:
+                raise SchemaError(f"{col}: values outside {list(dtype.categories)}: {sorted(map(str, unknown))[:5]}")
+        return
+    if dtype.kind in "iu":
+        if isinstance(values.dtype, pd.CategoricalDtype) or values.dtype == object:
+            numeric = pd.to_numeric(values.astype(object), errors="coerce")
+            if (numeric.isna() & values.notna()).any():
+                raise SchemaError(f"{col}: non-numeric values for {dtype}")
+            values = numeric
+        if values.isna().any():
+            raise SchemaError(f"{col}: {int(values.isna().sum())} missing value(s) in an integer column")
+        array = values.to_numpy()
+        if array.dtype.kind not in "iufb":
+            raise SchemaError(f"{col}: non-numeric values for {dtype}")
+        if array.dtype.kind == "f" and (array % 1 != 0).any():
+            raise SchemaError(f"{col}: fractional values for {dtype}")
+        info = np.iinfo(dtype)
+        if len(array) and (array.min() < info.min or array.max() > info.max):
+            raise SchemaError(f"{col}: values in [{array.min()}, {array.max()}] don't fit {dtype}")
+
+
+def conform(df, schema=SCHEMA):
+    """df with its known columns validated and cast to their schema dtypes."""
+    casts = {}
+    for col in df.columns:
+        if col not in schema:
+            continue
+        dtype = pd.api.types.pandas_dtype(schema[col])
+        if df[col].dtype == dtype or (dtype == "category" and isinstance(df[col].dtype, pd.CategoricalDtype)):
+            continue
+        _check(col, df[col], dtype)
+        casts[col] = dtype
+    return df.astype(casts) if casts else df
+
+
+def memory_report(df):
+    """Per-column dtype and resident memory (MB, including string payloads), plus a total row."""
+    mb = df.memory_usage(deep=True, index=False) / 2**20
+    report = pd.DataFrame({"dtype": df.dtypes.astype(str), "MB": mb})
+    report.loc["(total)"] = ["", mb.sum()]
+    return report
+
+
+def _read_naive(path):
+    if str(path).endswith(".csv"):
+        return pd.read_csv(path)
+    return pd.read_parquet(path, partitioning=None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory report of data files, as read by pandas and as conformed.")
+    parser.add_argument("paths", nargs="+", help="CSV files or Parquet stores")
+    args = parser.parse_args()
+
+    for path in args.paths:
+        naive = _read_naive(path)
+        compact = conform(naive)
+        report = memory_report(naive).join(memory_report(compact), lsuffix=" (pandas)", rsuffix=" (schema)")
+        before, after = report.loc["(total)", "MB (pandas)"], report.loc["(total)", "MB (schema)"]
+        print(f"\n{path}: {len(naive):,} rows, {before:.2f} MB -> {after:.2f} MB ({before / after:.1f}x smaller)")
+        print(report.to_string(float_format=lambda mb: f"{mb:.3f}"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""Batch scoring with the persisted conversion model.
+
+Streams sessions (a Parquet store, a date-partitioned store directory or a
+CSV) through the saved preprocessor and classifier in fixed-size batches and
+appends the predictions to the output as each batch finishes, so memory stays
+flat however many sessions are scored. Cleaned sessions work too: their model
+features are derived per batch by ``scripts.features``, as in training. No
+retraining and no plotting imports.
+
+With ``--top-pct``/``--top-k`` the same pass also ranks the scores
+(``scripts.topk.Ranking``): the top-k sessions are written to ``--top-output``
+and precision@k and the score deciles are printed, without holding or sorting
+all predictions:
+
+    python -m scripts.score --input data/engineered_sessions.parquet --output outputs/scored_sessions.parquet
+    python -m scripts.score --input data/sessions --batch-size 200000 --workers 4
+    python -m scripts.score --top-pct 10 --top-output outputs/top_scored_sessions.parquet
+"""
+import argparse
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+
+import pandas as pd
+import pyarrow.dataset as ds
+
+from scripts.model_artifact import FEATURES, MODEL_PATH, load_artifact, model_frame, predict_proba
+from scripts.schema import conform
+from scripts.session_store import ENGINEERED_STORE, SCORED_STORE, SessionWriter
+from scripts.topk import Ranking
+
+TOP_SCORED_STORE = "outputs/top_scored_sessions.parquet"
+BATCH_SIZE = 100_000
+
+# Columns copied to the output when the input has them: identifiers, the model
+# features (raw country/source, before lumping) and the outcome
+PASSTHROUGH = ["fullvisitorid", "visitid", "date"] + FEATURES + ["converted"]
+
+
+def score_frame(df, artifact):
+    """Passthrough columns of df plus p_conversion and the thresholded flag."""
+    if "high_value_region" not in df.columns:  # cleaned sessions: derive the features once, for both
+        from scripts.features import add_features
+
+        df = add_features(df, artifact["high_value_countries"])
+    out = df[[col for col in PASSTHROUGH if col in df.columns]].reset_index(drop=True)
+    p = predict_proba(artifact, model_frame(df, artifact))
+    out["p_conversion"] = p
+    out["above_threshold"] = (p >= artifact["threshold"]).astype("int8")
+    return out
+
+
+def read_batches(path, batch_size=BATCH_SIZE):
+    # Read only the model and passthrough columns, one batch at a time
+    wanted = set(FEATURES + PASSTHROUGH)
+    if str(path).endswith(".csv"):
+        for chunk in pd.read_csv(path, chunksize=batch_size, usecols=lambda col: col in wanted):
+            yield conform(chunk)
+        return
+    dataset = ds.dataset(path, format="parquet", partitioning=None)
+    columns = [name for name in dataset.schema.names if name in wanted]
+    for batch in dataset.to_batches(columns=columns, batch_size=batch_size):
+        if batch.num_rows:
+            yield conform(batch.to_pandas())
+
+
+def count_rows(path):
+    """Sessions in path, from the Parquet footers (or one pass over a CSV's lines)."""
+    if str(path).endswith(".csv"):
+        with open(path, "rb") as f:
+            return max(sum(chunk.count(b"\n") for chunk in iter(lambda: f.read(1 << 20), b"")) - 1, 0)
+    return ds.dataset(path, format="parquet", partitioning=None).count_rows()
+
+
+# ── worker processes: each loads the artifact once, then scores batches ──
+_worker_artifact = None
+
+
+def _init_worker(model_path, threads):
+    global _worker_artifact
+    _worker_artifact = load_artifact(model_path)
+    if _worker_artifact["preprocessor"] is not None:  # compiled models are single-threaded numpy
+        _worker_artifact["model"].set_params(n_jobs=threads)
+
+
+def _score_in_worker(df):
+    return score_frame(df, _worker_artifact)
+
+
+def _ordered_map(executor, fn, items, window):
+    # Like executor.map, but keeps at most `window` batches in flight so the
+    # reader never runs ahead of the writer by more than that
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+class _OutputWriter:
+    """Append scored batches to a Parquet or CSV file."""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._csv = str(path).endswith(".csv")
+        self._parquet = None if self._csv else SessionWriter(path)
+        self._first = True
+
+    def write(self, df):
+        if self._csv:
+            df.to_csv(self.path, index=False, mode="w" if self._first else "a", header=self._first)
+        else:
+            self._parquet.write(df)
+        self._first = False
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def score_sessions(input_path=ENGINEERED_STORE, output_path=SCORED_STORE, model_path=MODEL_PATH,
+                   batch_size=BATCH_SIZE, workers=1, ranking=None):
+    """Score every session of input_path into output_path; returns (sessions, flagged).
+    Each scored batch is also added to ranking (a ``Ranking``), if given."""
+    batches = read_batches(input_path, batch_size)
+    sessions = flagged = 0
+    with _OutputWriter(output_path) as writer, ExitStack() as stack:
+        if workers <= 1:
+            artifact = load_artifact(model_path)
+            scored = (score_frame(df, artifact) for df in batches)
+        else:
+            # Split the machine's cores between the workers' xgboost threads
+            threads = max(1, (os.cpu_count() or 1) // workers)
+            executor = stack.enter_context(ProcessPoolExecutor(
+                workers, initializer=_init_worker, initargs=(model_path, threads)))
+            scored = _ordered_map(executor, _score_in_worker, batches, 2 * workers)
+        for df in scored:
+            writer.write(df)
+            if ranking is not None:
+                ranking.add(df)
+            sessions += len(df)
+            flagged += int(df["above_threshold"].sum())
+    return sessions, flagged
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score sessions with the persisted conversion model.")
+    parser.add_argument("--input", default=ENGINEERED_STORE,
+                        help="engineered sessions: Parquet store, partitioned store directory or CSV")
+    parser.add_argument("--output", default=SCORED_STORE, help="predictions file (.parquet or .csv)")
+    parser.add_argument("--model", default=MODEL_PATH, help="model artifact saved by training")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="sessions scored per batch")
+    parser.add_argument("--workers", type=int, default=1, help="scoring processes")
+    top = parser.add_mutually_exclusive_group()
+    top.add_argument("--top-k", type=int, default=None, help="also rank the scores and export the top K sessions")
+    top.add_argument("--top-pct", type=float, default=None,
+                     help="also rank the scores and export the top PCT %% of the sessions")
+    parser.add_argument("--top-output", default=TOP_SCORED_STORE, help="top sessions file (.parquet or .csv)")
+    args = parser.parse_args()
+
+    ranking = None
+    if args.top_k is not None or args.top_pct is not None:
+        k = args.top_k if args.top_k is not None else int(args.top_pct / 100 * count_rows(args.input))
+        ranking = Ranking(k)
+    sessions, flagged = score_sessions(args.input, args.output, args.model, args.batch_size, args.workers, ranking)
+    print(f"Scored {sessions:,} sessions ({flagged:,} above threshold) into '{args.output}'")
+    if ranking is None:
+        return
+
+    top = ranking.top()
+    with _OutputWriter(args.top_output) as writer:
+        writer.write(top)
+    print(f"Saved the top {len(top):,} sessions to '{args.top_output}'")
+    precision = ranking.precision_at_k()
+    if precision is not None:
+        print(f"Precision@top {len(top):,}: {precision:.4f}")
+    print("Score deciles (0 = top scoring):")
+    print(ranking.deciles().to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""Online conversion scoring over HTTP (asyncio, standard library only).
+
+Loads the persisted model artifact once and serves
+
+    POST /score   {"devicecategory": "desktop", "source": "google", "country": "Canada",
+                   "pageviews": 7, "timeonsite": 312}
+                  or {"sessions": [{...}, {...}]}
+    GET  /health
+
+Raw session fields go in; is_bounce, session_bin, pageviews_per_minute,
+device_source_combo and high_value_region are derived server-side with
+``scripts.features``. Concurrent requests are micro-batched: requests that
+arrive while a batch is being scored (or within ``--max-wait-ms`` of an idle
+service receiving one) are scored together in a single ``predict_proba``
+call, so per-request model overhead is paid once per batch.
+
+    python -m scripts.scoring_service --port 8765
+
+Latency targets (measured by ``python -m benchmarks.bench_scoring_service``
+at 32 concurrent clients, load generator on the same core): p50 <= 50 ms,
+p99 <= 150 ms. A pipeline model call costs ~18 ms of fixed sklearn/pandas
+overhead whatever its size, which is why batching matters; serving the
+compiled model (``--model models/conversion_model.npz``) removes most of it.
+"""
+import argparse
+import asyncio
+import json
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from scripts.features import RAW_FIELDS, add_features
+from scripts.model_artifact import MODEL_PATH, load_artifact, model_frame, predict_proba
+
+P50_TARGET_MS = 50
+P99_TARGET_MS = 150
+
+MAX_BATCH = 512
+MAX_WAIT_MS = 1.0
+MAX_BODY_BYTES = 1 << 20
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class RequestError(ValueError):
+    """A request the service cannot score; reported to the client as a 400."""
+
+
+def parse_sessions(payload):
+    """Validate a request body into (records, single) where single marks a bare session object."""
+    single = isinstance(payload, dict) and "sessions" not in payload
+    records = [payload] if single else payload.get("sessions") if isinstance(payload, dict) else None
+    if not isinstance(records, list) or not records:
+        raise RequestError('expected a session object or {"sessions": [...]}')
+    parsed = []
+    for i, record in enumerate(records):
+        if not isinstance(record, dict):
+            raise RequestError(f"session {i} is not an object")
+        missing = [field for field in RAW_FIELDS if field not in record]
+        if missing:
+            raise RequestError(f"session {i} is missing {', '.join(missing)}")
+        row = {field: record[field] for field in RAW_FIELDS}
+        for field in ("devicecategory", "source", "country"):
+            if row[field] is not None and not isinstance(row[field], str):
+                raise RequestError(f"session {i}: {field} must be a string or null")
+        for field in ("pageviews", "timeonsite"):
+            # Missing counts are zero, as in cleaning
+            try:
+                row[field] = 0.0 if row[field] is None else float(row[field])
+            except (TypeError, ValueError):
+                raise RequestError(f"session {i}: {field} must be a number") from None
+            if not math.isfinite(row[field]) or row[field] < 0:
+                raise RequestError(f"session {i}: {field} must be a finite, non-negative number")
+        parsed.append(row)
+    return parsed, single
+
+
+class Scorer:
+    """Scores lists of raw session records with the loaded artifact."""
+
+    def __init__(self, artifact):
+        self.artifact = artifact
+        self.threshold = float(artifact["threshold"])
+        self.high_value = artifact["high_value_countries"]
+
+    def __call__(self, records):
+        sessions = add_features(pd.DataFrame.from_records(records, columns=RAW_FIELDS), self.high_value)
+        return predict_proba(self.artifact, model_frame(sessions, self.artifact)).tolist()
+
+
+class MicroBatcher:
+    """Coalesces concurrent scoring requests into batched model calls."""
+
+    def __init__(self, score, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        self.score = score
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.sessions = 0
+        self._queue = asyncio.Queue()
+        # One model thread: batches run back to back while the loop keeps accepting requests
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="score")
+
+    async def submit(self, records):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((records, future))
+        return await future
+
+    async def _collect(self):
+        # Block for the first request, take everything already queued, then
+        # wait up to max_wait for stragglers if the batch still has room
+        items = [await self._queue.get()]
+        size = len(items[0][0])
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+        while size < self.max_batch:
+            if self._queue.empty():
+                remaining = deadline - asyncio.get_running_loop().time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                item = self._queue.get_nowait()
+            items.append(item)
+            size += len(item[0])
+        return items
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = await self._collect()
+            records = [record for batch, _ in items for record in batch]
+            try:
+                scores = await loop.run_in_executor(self._executor, self.score, records)
+            except Exception as exc:
+                if len(items) == 1:
+                    self._resolve(items[0][1], exception=exc)
+                else:
+                    # Rescore request by request so one bad request fails only itself
+                    for batch, future in items:
+                        try:
+                            scores = await loop.run_in_executor(self._executor, self.score, batch)
+                        except Exception as exc:
+                            self._resolve(future, exception=exc)
+                            continue
+                        self.batches += 1
+                        self.sessions += len(batch)
+                        self._resolve(future, scores)
+                continue
+            self.batches += 1
+            self.sessions += len(records)
+            start = 0
+            for batch, future in items:
+                self._resolve(future, scores[start:start + len(batch)])
+                start += len(batch)
+
+    @staticmethod
+    def _resolve(future, result=None, exception=None):
+        if future.done():  # the client may have gone away
+            return
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+
+
+class ScoringService:
+    def __init__(self, artifact, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        self.scorer = Scorer(artifact)
+        self.batcher = None
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self.started = time.time()
+
+    async def serve(self, host, port):
+        self.batcher = MicroBatcher(self.scorer, self.max_batch, self.max_wait_ms)
+        batching = asyncio.create_task(self.batcher.run())
+        server = await asyncio.start_server(self._handle, host, port)
+        address = server.sockets[0].getsockname()
+        print(f"Scoring service listening on http://{address[0]}:{address[1]}", flush=True)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batching.cancel()
+
+    async def _route(self, method, path, body):
+        if path == "/health":
+            return 200, {
+                "status": "ok",
+                "threshold": self.scorer.threshold,
+                "uptime_s": round(time.time() - self.started, 1),
+                "batches": self.batcher.batches,
+                "sessions": self.batcher.sessions,
+            }
+        if path != "/score":
+            return 404, {"error": f"no route {path}"}
+        if method != "POST":
+            return 405, {"error": "use POST"}
+        try:
+            records, single = parse_sessions(json.loads(body or b"null"))
+        except json.JSONDecodeError as exc:
+            return 400, {"error": f"invalid JSON: {exc}"}
+        except RequestError as exc:
+            return 400, {"error": str(exc)}
+        try:
+            scores = await self.batcher.submit(records)
+        except Exception as exc:
+            return 500, {"error": f"scoring failed: {exc}"}
+        predictions = [{"p_conversion": p, "above_threshold": p >= self.scorer.threshold} for p in scores]
+        return 200, predictions[0] if single else {"predictions": predictions}
+
+    async def _handle(self, reader, writer):
+        # Minimal HTTP/1.1 with keep-alive: one request at a time per connection
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY_BYTES:
+                    status, payload = 413, {"error": f"body larger than {MAX_BODY_BYTES} bytes"}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length)
+                    status, payload = await self._route(method, target.split("?", 1)[0], body)
+                    keep_alive = headers.get("connection", "").lower() != "close"
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass  # malformed request or client gone: drop the connection
+        finally:
+            writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the conversion model over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--model", default=MODEL_PATH, help="model artifact saved by training")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH, help="most sessions per model call")
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS,
+                        help="how long an idle service waits to fill a batch")
+    args = parser.parse_args()
+
+    service = ScoringService(load_artifact(args.model), args.max_batch, args.max_wait_ms)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Typed columnar (Parquet) storage for session tables.
+
+Pipeline stages hand sessions to each other through Parquet files with
+the compact dtypes of ``scripts.schema``; CSV is only used at the edges (raw GA exports in, optional
+exports out). A store is either a single file or, for incremental daily
+ingestion, a directory with one ``date=YYYY-MM-DD`` sub-directory per day
+plus a ``_manifest.json`` of the days already ingested.
+
+Run as a module to convert between CSV and Parquet:
+
+    python -m scripts.session_store import data/engineered_sessions.csv data/engineered_sessions.parquet
+    python -m scripts.session_store export data/cleaned_sessions.parquet data/cleaned_sessions.csv
+"""
+import argparse
+import glob
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from scripts.schema import conform
+
+CLEANED_STORE = "data/cleaned_sessions.parquet"
+ENGINEERED_STORE = "data/engineered_sessions.parquet"
+SCORED_STORE = "outputs/scored_sessions.parquet"  # every session with its p_conversion (scripts.score)
+SESSIONS_DIR = "data/sessions"  # date-partitioned store used by incremental ingestion
+MANIFEST_NAME = "_manifest.json"
+
+def read_sessions(path=CLEANED_STORE, columns=None):
+    """Load a session store (file or partitioned directory), reading only the requested columns.
+
+    Columns come back in their schema dtypes (see scripts.schema), so stores
+    written before a dtype was narrowed load as compactly as new ones.
+    """
+    # Partition directories are only a layout; the date column lives in the files
+    return conform(pd.read_parquet(path, columns=columns, partitioning=None))
+
+
+def write_sessions(df, path=CLEANED_STORE):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conform(df).to_parquet(path, index=False)
+
+
+def partition_path(root, day):
+    """Directory holding one day's partition, e.g. data/sessions/date=2017-07-04."""
+    return os.path.join(root, f"date={day}")
+
+
+def list_partitions(root):
+    """(day, directory) pairs for every partition under root, oldest first."""
+    dirs = sorted(glob.glob(os.path.join(root, "date=*")))
+    return [(os.path.basename(d).split("=", 1)[1], d) for d in dirs]
+
+
+def read_manifest(root):
+    path = os.path.join(root, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {"dates": {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_manifest(root, manifest):
+    # Write-then-rename so an interrupted run never leaves a half-written manifest
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, MANIFEST_NAME)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+class SessionWriter:
+    """Append typed chunks to one Parquet file (one row group per chunk)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._writer = None
+
+    def write(self, df):
+        table = pa.Table.from_pandas(conform(df), preserve_index=False)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, table.schema)
+        else:
+            table = table.cast(self._writer.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def import_csv(csv_path, store_path, chunksize=250_000):
+    # Stream a CSV session table into the store chunk by chunk
+    rows = 0
+    with SessionWriter(store_path) as writer:
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+            writer.write(chunk)
+            rows += len(chunk)
+    return rows
+
+
+def export_csv(store_path, csv_path):
+    # Write one row group at a time so exports stay bounded in memory too
+    parquet = pq.ParquetFile(store_path)
+    for i in range(parquet.num_row_groups):
+        chunk = parquet.read_row_group(i).to_pandas()
+        chunk.to_csv(csv_path, index=False, mode="w" if i == 0 else "a", header=i == 0)
+    return parquet.metadata.num_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert session tables between CSV and Parquet.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="CSV -> Parquet store")
+    imp.add_argument("csv")
+    imp.add_argument("store")
+    imp.add_argument("--chunksize", type=int, default=250_000)
+    exp = sub.add_parser("export", help="Parquet store -> CSV")
+    exp.add_argument("store")
+    exp.add_argument("csv")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        rows = import_csv(args.csv, args.store, args.chunksize)
+        print(f"Imported {rows:,} sessions into '{args.store}'")
+    else:
+        rows = export_csv(args.store, args.csv)
+        print(f"Exported {rows:,} sessions to '{args.csv}'")
+
+
+if __name__ == "__main__":
+    main()
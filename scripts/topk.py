@@ -0,0 +1,168 @@
+"""Top-k and decile selection over model scores, without sorting every score.
+
+* ``top_k(scores, k)``: positions of the k highest scores, best first (ties
+  in position order, like ``nlargest(keep="first")``). One ``np.partition``
+  finds the k-th score; only the k selected scores are sorted.
+* ``decile_table(scores, converted)``: the lift table by score-rank bucket
+  (equal-count buckets of the ranks, largest last), with one
+  ``np.argpartition`` at the bucket boundaries instead of a full sort.
+* ``Ranking``: the same answers for scores that arrive in batches (chunked
+  batch scoring), in one pass and bounded memory. It keeps about 2k
+  candidate rows (pruned back to the best k with ``top_k`` whenever they
+  fill up; rows below the k-th best score so far are dropped on arrival) and
+  a histogram of the scores with their conversions, from which the deciles
+  are read.
+
+The histogram bins a float32 score by the top 16 bits of its bit pattern
+(sign, exponent and 7 mantissa bits), which orders non-negative floats. Every
+bin is 1/128 of its own magnitude wide, so low scores are resolved as finely
+as high ones. Bucket sizes are exact; a bucket's conversions and lower
+boundary are exact up to the one bin that straddles each boundary, whose
+sessions are split between the two buckets pro rata.
+"""
+import numpy as np
+import pandas as pd
+
+BUCKETS = 10
+
+# Scores are probabilities: bins cover float32 patterns 0.0 .. 1.0
+_BIN_SHIFT = 16
+_BINS = (int(np.float32(1.0).view(np.uint32)) >> _BIN_SHIFT) + 1
+
+
+def top_k(scores, k):
+    """Positions of the k highest scores, best first (ties in position order)."""
+    scores = np.asarray(scores)
+    n = len(scores)
+    if k >= n:
+        return np.argsort(-scores, kind="stable")
+    if k <= 0:
+        return np.arange(0)
+    kth = np.partition(scores, n - k)[n - k]  # the k-th highest score
+    above = np.flatnonzero(scores > kth)
+    ties = np.flatnonzero(scores == kth)[:k - len(above)]
+    chosen = np.concatenate([above, ties])
+    return chosen[np.argsort(-scores[chosen], kind="stable")]
+
+
+def _bucket_ends(n, buckets):
+    # Rank r (0 = top score) falls in bucket r * buckets // n; returns each bucket's end rank
+    return -(-np.arange(1, buckets + 1) * n // buckets)
+
+
+def _lift(table):
+    table["conversion_rate"] = table["conversions"] / table["total"]
+    baseline = table["conversions"].sum() / table["total"].sum()
+    table["lift"] = table["conversion_rate"] / baseline
+    return table[["bucket", "conversions", "total", "conversion_rate", "lift", "min_score"]]
+
+
+def decile_table(scores, converted, buckets=BUCKETS):
+    """Conversions, sessions, conversion rate, lift and lowest score per score-rank
+    bucket (0 = top scoring)."""
+    scores = np.asarray(scores)
+    converted = np.asarray(converted)
+    ends = _bucket_ends(len(scores), buckets)
+    order = np.argpartition(-scores, ends[:-1] - 1) if len(scores) > 1 else np.arange(len(scores))
+    starts = np.concatenate([[0], ends[:-1]])
+    sizes = ends - starts
+    ranked_scores, ranked_converted = scores[order], converted[order]
+    nonempty = sizes > 0
+    conversions = np.zeros(buckets, dtype=np.int64)
+    min_score = np.full(buckets, np.nan)
+    conversions[nonempty] = np.add.reduceat(ranked_converted.astype(np.int64), starts[nonempty])
+    min_score[nonempty] = np.minimum.reduceat(ranked_scores, starts[nonempty])
+    return _lift(pd.DataFrame({
+        "bucket": np.arange(buckets), "conversions": conversions, "total": sizes, "min_score": min_score,
+    }))
+
+
+class Ranking:
+    """Top-k rows, precision@k and score deciles of a stream of scored batches.
+
+    Feed batches to ``add``; only about 2k candidate rows and a fixed-size
+    histogram are kept. ``label`` (e.g. converted) is optional: without it
+    there is no precision or conversion count.
+    """
+
+    def __init__(self, k, score="p_conversion", label="converted"):
+        self.k = k
+        self.score = score
+        self.label = label
+        self.rows = 0
+        self._top = None
+        self._pending = []  # rows added since the last prune
+        self._pending_rows = 0
+        self._sessions = np.zeros(_BINS, dtype=np.int64)
+        self._conversions = np.zeros(_BINS, dtype=np.int64)
+        self._has_label = True
+
+    def add(self, df):
+        scores = np.clip(df[self.score].to_numpy(dtype=np.float32), 0, 1) + np.float32(0)  # + 0 turns -0.0 into 0.0
+        bins = scores.view(np.uint32) >> _BIN_SHIFT
+        self._sessions += np.bincount(bins, minlength=_BINS)
+        self._has_label &= self.label in df.columns
+        if self._has_label:
+            converted = df[self.label].to_numpy() > 0
+            self._conversions += np.bincount(bins, weights=converted, minlength=_BINS).astype(np.int64)
+        self.rows += len(df)
+        if self.k <= 0:
+            return
+
+        # Rows scoring below the k-th best so far can never enter the top k
+        if self._top is not None and len(self._top) == self.k:
+            df = df[df[self.score].to_numpy() > self._top[self.score].iat[-1]]
+        if df.empty:
+            return
+        self._pending.append(df)
+        self._pending_rows += len(df)
+        if self._pending_rows >= self.k:
+            self._prune()
+
+    def _prune(self):
+        # Earlier rows come first among the candidates, so ties keep arrival order
+        frames = ([] if self._top is None else [self._top]) + self._pending
+        if not frames:
+            return
+        candidates = pd.concat(frames, ignore_index=True)
+        self._top = candidates.take(top_k(candidates[self.score].to_numpy(), self.k)).reset_index(drop=True)
+        self._pending, self._pending_rows = [], 0
+
+    def top(self):
+        """The k highest-scoring rows seen, best first."""
+        self._prune()
+        return self._top if self._top is not None else pd.DataFrame()
+
+    def precision_at_k(self):
+        """Share of the top k rows that converted (None without a label)."""
+        top = self.top()
+        if not self._has_label or top.empty:
+            return None
+        return float((top[self.label].to_numpy() > 0).mean())
+
+    def deciles(self, buckets=BUCKETS):
+        """decile_table() of every score seen, read from the histogram."""
+        # Bins from the highest score down, with cumulative sessions and conversions
+        sessions, conversions = self._sessions[::-1], self._conversions[::-1]
+        cum_sessions = np.concatenate([[0], np.cumsum(sessions)])
+        cum_conversions = np.concatenate([[0], np.cumsum(conversions)])
+        edges = np.concatenate([[0], _bucket_ends(self.rows, buckets)])
+
+        # Conversions among the first r ranks, splitting the bin r falls in pro rata
+        bin_of = np.clip(np.searchsorted(cum_sessions, edges, side="right") - 1, 0, len(sessions) - 1)
+        within = edges - cum_sessions[bin_of]
+        rate = np.divide(conversions[bin_of], sessions[bin_of],
+                         out=np.zeros(len(edges)), where=sessions[bin_of] > 0)
+        converted_before = cum_conversions[bin_of] + within * rate
+
+        # Lowest score per bucket: lower edge of the bin holding its last rank
+        last = np.clip(np.searchsorted(cum_sessions, edges[1:], side="left") - 1, 0, len(sessions) - 1)
+        lower_edge = ((_BINS - 1 - last).astype(np.uint32) << _BIN_SHIFT).view(np.float32).astype(np.float64)
+        sizes = np.diff(edges)
+        table = pd.DataFrame({
+            "bucket": np.arange(buckets),
+            "conversions": np.round(np.diff(converted_before)).astype(np.int64) if self._has_label else 0,
+            "total": sizes,
+            "min_score": np.where(sizes > 0, lower_edge, np.nan),
+        })
+        return _lift(table)
@@ -0,0 +1,200 @@
+"""Cross-validated hyperparameter search for the conversion model.
+
+Run through the training CLI, which prepares the same features and train
+split it trains on:
+
+    python -m scripts.xgboost_model tune --trials 40 --workers 2
+
+* Every CV fold is preprocessed once (preprocessor fitted on the fold's
+  training part) and cached as ``.npy`` files under ``--cache-dir``, keyed
+  by a hash of the data and preprocessor settings. Trials memory-map the
+  cached folds, so all worker processes share one copy through the page
+  cache and nothing is re-encoded per trial.
+* Trials run in a process pool; each trial's XGBoost is limited to
+  ``--threads-per-trial`` threads so workers don't oversubscribe the cores.
+* Each fold trains with early stopping on validation ``logloss``.
+* Finished trials are appended to ``--results`` (JSON lines) as they
+  complete. Trial parameters are drawn deterministically from the seed, so
+  rerunning the same search skips recorded trials and resumes.
+
+``python -m scripts.xgboost_model --tuned`` then trains with the best
+recorded trial's parameters, among the trials run on the same data with the
+same ``--folds``/``--seed`` (these and ``--results`` are options of the
+training CLI itself, shared by ``tune`` and ``--tuned``).
+"""
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+TUNING_DIR = "models/tuning"
+RESULTS_PATH = "models/tuning/trials.jsonl"
+
+# Fixed model settings; trials vary the search space below
+BASE_PARAMS = {"colsample_bytree": 0.8, "random_state": 42}
+MAX_ROUNDS = 1000
+EARLY_STOPPING_ROUNDS = 30
+
+SEARCH_SPACE = {
+    "max_depth": [3, 4, 5, 6, 8],
+    "learning_rate": (0.02, 0.3),  # log-uniform
+    "subsample": (0.6, 1.0),       # uniform
+    "min_child_weight": [1, 2, 5, 10],
+}
+
+
+def trial_params(trial, seed):
+    """Parameters of trial number `trial`; the same (trial, seed) always gives the same draw."""
+    rng = np.random.default_rng([seed, trial])
+    lo, hi = SEARCH_SPACE["learning_rate"]
+    return {
+        "max_depth": int(rng.choice(SEARCH_SPACE["max_depth"])),
+        "learning_rate": round(float(np.exp(rng.uniform(np.log(lo), np.log(hi)))), 4),
+        "subsample": round(float(rng.uniform(*SEARCH_SPACE["subsample"])), 3),
+        "min_child_weight": int(rng.choice(SEARCH_SPACE["min_child_weight"])),
+    }
+
+
+# ── fold cache ──
+def data_key(X, y, preprocessor):
+    """Hash of the training data and preprocessor settings a search ran on."""
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(X, index=True).to_numpy().tobytes())
+    digest.update(np.asarray(y).tobytes())
+    digest.update(repr(sorted(preprocessor.get_params(deep=True).items(), key=str)).encode())
+    return digest.hexdigest()[:16]
+
+
+def _save_matrix(path, m):
+    if sp.issparse(m):
+        m = m.tocsr()
+        for part in ("data", "indices", "indptr"):
+            np.save(f"{path}.{part}.npy", getattr(m, part))
+        np.save(f"{path}.shape.npy", np.array(m.shape))
+    else:
+        np.save(f"{path}.npy", np.ascontiguousarray(m))
+
+
+def _load_matrix(path):
+    # Memory-mapped: pages are shared between processes and read on demand
+    if os.path.exists(f"{path}.npy"):
+        return np.load(f"{path}.npy", mmap_mode="r")
+    parts = [np.load(f"{path}.{part}.npy", mmap_mode="r") for part in ("data", "indices", "indptr")]
+    return sp.csr_matrix(tuple(parts), shape=tuple(np.load(f"{path}.shape.npy")), copy=False)
+
+
+def cache_folds(X, y, preprocessor, cache_dir, n_splits=5, seed=42):
+    """Preprocess each stratified CV fold once into a directory under cache_dir; returns it."""
+    from sklearn.base import clone
+    from sklearn.model_selection import StratifiedKFold
+
+    key = data_key(X, y, preprocessor)
+    fold_dir = os.path.join(cache_dir, f"folds-{key}-{n_splits}x{seed}")
+    if os.path.exists(os.path.join(fold_dir, "done")):
+        return fold_dir
+
+    os.makedirs(fold_dir, exist_ok=True)
+    y = np.asarray(y)
+    folds = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=seed)
+    for i, (train_idx, val_idx) in enumerate(folds.split(X, y)):
+        fitted = clone(preprocessor)
+        _save_matrix(os.path.join(fold_dir, f"{i}.X_train"), fitted.fit_transform(X.iloc[train_idx]))
+        _save_matrix(os.path.join(fold_dir, f"{i}.X_val"), fitted.transform(X.iloc[val_idx]))
+        np.save(os.path.join(fold_dir, f"{i}.y_train.npy"), y[train_idx])
+        np.save(os.path.join(fold_dir, f"{i}.y_val.npy"), y[val_idx])
+    with open(os.path.join(fold_dir, "done"), "w") as f:
+        json.dump({"n_splits": n_splits, "seed": seed}, f)
+    return fold_dir
+
+
+def load_folds(fold_dir):
+    with open(os.path.join(fold_dir, "done")) as f:
+        n_splits = json.load(f)["n_splits"]
+    return [
+        tuple(_load_matrix(os.path.join(fold_dir, f"{i}.{name}"))
+              for name in ("X_train", "y_train", "X_val", "y_val"))
+        for i in range(n_splits)
+    ]
+
+
+# ── trials (run in worker processes) ──
+_folds = None
+
+
+def _init_worker(fold_dir):
+    global _folds
+    _folds = load_folds(fold_dir)
+
+
+def run_trial(trial, params, threads):
+    from xgboost import XGBClassifier
+
+    start = time.perf_counter()
+    losses, rounds = [], []
+    for X_train, y_train, X_val, y_val in _folds:
+        model = XGBClassifier(
+            **BASE_PARAMS, **params, n_estimators=MAX_ROUNDS, eval_metric="logloss",
+            early_stopping_rounds=EARLY_STOPPING_ROUNDS, n_jobs=threads,
+        )
+        model.fit(X_train, y_train, eval_set=[(X_val, y_val)], verbose=False)
+        losses.append(float(model.best_score))
+        rounds.append(int(model.best_iteration) + 1)
+    return {
+        "trial": trial,
+        "params": params,
+        "logloss": float(np.mean(losses)),
+        "logloss_std": float(np.std(losses)),
+        "n_estimators": int(np.mean(rounds)),
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+
+
+# ── search ──
+def read_results(path, key=None, n_splits=None, seed=None):
+    """Recorded trials, optionally only those for data key `key` and for the CV
+    settings (n_splits, seed): losses from other folds aren't comparable."""
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        results = [json.loads(line) for line in f if line.strip()]
+    return [
+        r for r in results
+        if (key is None or r["data_key"] == key)
+        and (n_splits is None or r["n_splits"] == n_splits)
+        and (seed is None or r["seed"] == seed)
+    ]
+
+
+def best_trial(path, key=None, n_splits=None, seed=None):
+    results = read_results(path, key, n_splits, seed)
+    return min(results, key=lambda r: r["logloss"]) if results else None
+
+
+def search(X, y, preprocessor, trials=20, workers=1, threads_per_trial=None, n_splits=5, seed=42,
+           cache_dir=TUNING_DIR, results_path=RESULTS_PATH):
+    """Run the trials not yet recorded in results_path; returns every recorded trial
+    for this data and these CV settings."""
+    key = data_key(X, y, preprocessor)
+    fold_dir = cache_folds(X, y, preprocessor, cache_dir, n_splits, seed)
+    done = {r["trial"] for r in read_results(results_path, key, n_splits, seed)}
+    todo = [t for t in range(trials) if t not in done]
+    threads = threads_per_trial or max(1, (os.cpu_count() or 1) // workers)
+    print(f"{len(done)} of {trials} trials already recorded; running {len(todo)} "
+          f"on {workers} worker(s) x {threads} thread(s)")
+
+    os.makedirs(os.path.dirname(results_path) or ".", exist_ok=True)
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(fold_dir,)) as executor:
+        futures = [executor.submit(run_trial, t, trial_params(t, seed), threads) for t in todo]
+        for future in as_completed(futures):
+            result = {**future.result(), "data_key": key, "n_splits": n_splits, "seed": seed}
+            # Append as each trial finishes so an interrupted search keeps its progress
+            with open(results_path, "a") as f:
+                f.write(json.dumps(result) + "\n")
+            print(f"  trial {result['trial']:3d}  logloss {result['logloss']:.5f}  "
+                  f"rounds {result['n_estimators']:4d}  {result['seconds']:6.1f}s  {result['params']}")
+    return read_results(results_path, key, n_splits, seed)
@@ -1,58 +1,107 @@
+"""Train the conversion model, report its evaluation and export predictions.
+
+    python -m scripts.xgboost_model                     # dense one-hot (default)
+    python -m scripts.xgboost_model --sparse --top-n 0  # CSR one-hot, no country/source cap
+    python -m scripts.xgboost_model tune --trials 40    # CV search, see scripts/tuning.py
+    python -m scripts.xgboost_model --tuned             # train with the best recorded trial
+    python -m scripts.xgboost_model --results runs.jsonl --folds 3 tune  # search options go before `tune`
+
+The fitted preprocessor is applied once to the train and test splits; the
+encoded matrices are reused for training and evaluation, and the same fitted
+transform is saved in the model artifact. The artifact and the predictions
+are written before anything is plotted; the feature-importance and lift plots
+are saved to outputs/ (``--show`` also opens them on screen). SHAP
+explanations are a separate stage over the saved artifact:
+``python -m scripts.explain``.
+"""
+import argparse
+import resource
+
 import pandas as pd
 import numpy as np
+import scipy.sparse as sp
 from xgboost import XGBClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, roc_auc_score
 from sklearn.preprocessing import OneHotEncoder
-from sklearn.pipeline import Pipeline
 from sklearn.compose import ColumnTransformer
 from sklearn.preprocessing import StandardScaler
 
-# Load data
-df = pd.read_csv("data/engineered_sessions.csv")
+from scripts.features import high_value_countries
+from scripts.model_artifact import (
+    CATEGORICAL_COLS, FEATURES, NUMERICAL_COLS, lump_rare, save_artifact, top_values,
+)
+from scripts.session_store import ENGINEERED_STORE, read_sessions
+from scripts.topk import decile_table, top_k
+from scripts.tuning import BASE_PARAMS, RESULTS_PATH, TUNING_DIR, best_trial, data_key, search
+
+IMPORTANCE_PLOT = "outputs/feature_importance.png"
+LIFT_PLOT = "outputs/lift_chart.png"
+
+parser = argparse.ArgumentParser(description="Train and evaluate the conversion model.")
+parser.add_argument("--sparse", action="store_true",
+                    help="one-hot encode into CSR matrices instead of dense arrays")
+parser.add_argument("--top-n", type=int, default=10,
+                    help="keep the top N countries/sources, lumping the rest into 'Other' (0 = keep all)")
+parser.add_argument("--tuned", action="store_true",
+                    help="train with the parameters of the best recorded tuning trial")
+parser.add_argument("--show", action="store_true",
+                    help="also show the plots on screen once everything is saved (they are always saved)")
+# Which recorded search `tune` extends and `--tuned` reads: results file and CV settings
+parser.add_argument("--results", default=RESULTS_PATH, help="tuning trial results (JSON lines)")
+parser.add_argument("--folds", type=int, default=5, help="CV folds of the tuning search")
+parser.add_argument("--seed", type=int, default=42, help="seed of the tuning search (folds and trial parameters)")
+subcommands = parser.add_subparsers(dest="command")
+tune_parser = subcommands.add_parser("tune", help="cross-validated hyperparameter search on the training split")
+tune_parser.add_argument("--trials", type=int, default=20, help="trials in the search (recorded ones are skipped)")
+tune_parser.add_argument("--workers", type=int, default=1, help="trial processes")
+tune_parser.add_argument("--threads-per-trial", type=int, default=None,
+                         help="XGBoost threads per trial (default: cores / workers)")
+tune_parser.add_argument("--cache-dir", default=TUNING_DIR, help="where preprocessed folds are cached")
+args = parser.parse_args()
+if args.command == "tune" and args.trials < 1:
+    tune_parser.error(f"--trials must be at least 1, got {args.trials}")
+
+# Define features and target
+features = FEATURES
+
+# Load data (only the model columns, with categoricals already encoded)
+df = read_sessions(ENGINEERED_STORE, columns=features + ["converted"])
 
 df = df[df["converted"].isin([0, 1])]
 
+# Countries behind high_value_region, needed to derive it for new sessions
+high_value = high_value_countries(df)
+
 # Keep only top countries and sources to reduce dimensionality
-top_n = 10
-top_countries = df["country"].value_counts().nlargest(top_n).index
-top_sources = df["source"].value_counts().nlargest(top_n).index
-df["country"] = df["country"].where(df["country"].isin(top_countries), "Other")
-df["source"] = df["source"].where(df["source"].isin(top_sources), "Other")
+top_n = args.top_n or None
+top_countries = top_values(df["country"], top_n)
+top_sources = top_values(df["source"], top_n)
+df["country"] = lump_rare(df["country"], top_countries)
+df["source"] = lump_rare(df["source"], top_sources)
 
-# Define features and target
-features = [
-    "devicecategory", "source", "country",
-    "pageviews", "timeonsite",
-    "is_bounce", "session_bin",
-    "pageviews_per_minute", "device_source_combo",
-    "high_value_region"
-]
 df_model = df[features + ["converted"]].dropna()
 
 # Prepare column names
-categorical_cols = ["devicecategory", "source", "country", "session_bin", "device_source_combo"]
-numerical_cols = ["pageviews", "timeonsite", "is_bounce", "pageviews_per_minute", "high_value_region"]
+categorical_cols = CATEGORICAL_COLS
+numerical_cols = NUMERICAL_COLS
 
-# Preprocessing
+# Preprocessing (sparse mode keeps the one-hot block, and so the whole matrix, in CSR)
 preprocessor = ColumnTransformer(transformers=[
-    ('cat', OneHotEncoder(handle_unknown='ignore', sparse_output=False), categorical_cols),
+    ('cat', OneHotEncoder(handle_unknown='ignore', sparse_output=args.sparse), categorical_cols),
     ('num', StandardScaler(), numerical_cols)
-])
-
-# Define pipeline
-pipeline = Pipeline(steps=[
-    ('preprocessor', preprocessor),
-    ('model', XGBClassifier(
-        eval_metric="logloss",
-        n_estimators=100,
-        max_depth=4,
-        learning_rate=0.1,
-        subsample=0.8,
-        colsample_bytree=0.8,
-        random_state=42
-    ))
-])
+], sparse_threshold=1.0 if args.sparse else 0.0)
+
+# Define model
+model = XGBClassifier(
+    eval_metric="logloss",
+    n_estimators=100,
+    max_depth=4,
+    learning_rate=0.1,
+    subsample=0.8,
+    colsample_bytree=0.8,
+    random_state=42
+)
 
 # Prepare data
 X = df_model[categorical_cols + numerical_cols]
@@ -61,34 +110,37 @@ y = df_model["converted"]
 # Train/test split
 X_train, X_test, y_train, y_test = train_test_split(X, y, stratify=y, test_size=0.2, random_state=42)
 
-# Fit the full pipeline
-pipeline.fit(X_train, y_train)
+# Hyperparameter search (the test split stays held out)
+if args.command == "tune":
+    results = search(X_train, y_train, preprocessor, args.trials, args.workers, args.threads_per_trial,
+                     args.folds, args.seed, args.cache_dir, args.results)
+    if not results:
+        raise SystemExit(f"No tuning trials recorded for this data and --folds {args.folds} --seed {args.seed} "
+                         f"in {args.results}")
+    best = min(results, key=lambda r: r["logloss"])
+    print(f"Best trial {best['trial']}: logloss {best['logloss']:.5f} with {best['params']}, "
+          f"{best['n_estimators']} rounds")
+    raise SystemExit
 
-# Show top 15 feature importances
-import matplotlib.pyplot as plt
+if args.tuned:
+    best = best_trial(args.results, data_key(X_train, y_train, preprocessor), args.folds, args.seed)
+    if best is None:
+        raise SystemExit(f"No tuning trials recorded for this data and --folds {args.folds} --seed {args.seed} "
+                         f"in {args.results}; run `python -m scripts.xgboost_model tune` with the same options first")
+    model.set_params(**BASE_PARAMS, **best["params"], n_estimators=best["n_estimators"])
+    print(f"Training with tuned parameters from trial {best['trial']}: {best['params']}, "
+          f"{best['n_estimators']} rounds")
 
-importances = pipeline.named_steps['model'].feature_importances_
-encoded_cat_names = pipeline.named_steps['preprocessor'].named_transformers_['cat'].get_feature_names_out(categorical_cols)
-all_feature_names = np.concatenate([encoded_cat_names, numerical_cols])
+# Encode once; every step below reuses these matrices instead of re-transforming
+X_train_enc = preprocessor.fit_transform(X_train)
+X_test_enc = preprocessor.transform(X_test)
 
-importance_df = pd.DataFrame({
-    "feature": all_feature_names,
-    "importance": importances
-}).sort_values(by="importance", ascending=False)
-
-top_features = importance_df.head(15)
-
-plt.figure(figsize=(10, 6))
-plt.barh(top_features["feature"][::-1], top_features["importance"][::-1])
-plt.xlabel("Feature Importance")
-plt.title("Top 15 Feature Importances (XGBoost)")
-plt.tight_layout()
-plt.grid(axis='x')
-plt.show()
+# Fit the model
+model.fit(X_train_enc, y_train)
 
 # Predict and evaluate
-y_pred = pipeline.predict(X_test)
-y_proba = pipeline.predict_proba(X_test)[:, 1]
+y_pred = model.predict(X_test_enc)
+y_proba = model.predict_proba(X_test_enc)[:, 1]
 
 # Print report
 print("Classification Report:")
@@ -114,49 +166,22 @@ print(classification_report(y_test, y_pred_tuned))
 print(f"Best Threshold: {best_threshold:.4f}")
 print(f"Best F1 Score: {best_f1:.4f}")
 
+# Persist the fitted model so new sessions can be scored without retraining
+save_artifact(preprocessor, model, best_threshold, top_countries, top_sources, high_value,
+              sparse=args.sparse)
+print("Saved model artifact to models/conversion_model.joblib (score with `python -m scripts.score`)")
+
 from sklearn.metrics import precision_score
-import seaborn as sns
 
-# Precision@K (Top 10% of predictions by confidence)
+# Precision@K (Top 10% of predictions by confidence); the same top-k rows are flagged and exported below
 k = int(0.10 * len(y_test))
-top_k_indices = np.argsort(y_proba)[-k:]
+top_k_indices = top_k(y_proba, k)
 precision_at_k = precision_score(y_test.iloc[top_k_indices], y_pred[top_k_indices])
 print(f"Precision@Top10%: {precision_at_k:.4f}")
 
-# Lift Chart
-df_lift = pd.DataFrame({
-    "y_true": y_test,
-    "y_score": y_proba
-}).sort_values("y_score", ascending=False).reset_index(drop=True)
-df_lift["bucket"] = pd.qcut(df_lift.index, 10, labels=False)
-
-lift_table = df_lift.groupby("bucket").agg({
-    "y_true": ["sum", "count"]
-}).reset_index()
-lift_table.columns = ["bucket", "conversions", "total"]
-lift_table["conversion_rate"] = lift_table["conversions"] / lift_table["total"]
-baseline_rate = df_lift["y_true"].mean()
-lift_table["lift"] = lift_table["conversion_rate"] / baseline_rate
-
-# Plot Lift Chart
-plt.figure(figsize=(8, 5))
-sns.lineplot(data=lift_table, x="bucket", y="lift", marker="o")
-plt.axhline(1.0, linestyle="--", color="gray")
-plt.title("Lift Chart (Decile Buckets)")
-plt.xlabel("Decile (0 = Top Scoring)")
-plt.ylabel("Lift over Baseline")
-plt.grid(True)
-plt.tight_layout()
-plt.show()
-
-# SHAP interpretability
-import shap
-
-explainer = shap.Explainer(pipeline.named_steps['model'], pipeline.named_steps['preprocessor'].transform(X_train))
-shap_values = explainer(pipeline.named_steps['preprocessor'].transform(X_test))
-
-# SHAP summary plot
-shap.summary_plot(shap_values, features=pipeline.named_steps['preprocessor'].transform(X_test), feature_names=all_feature_names)
+# Lift by score decile (plotted below)
+lift_table = decile_table(y_proba, y_test.to_numpy())
+print(lift_table.to_string(index=False))
 
 # Export high-conversion-likelihood predictions
 output_df = X_test.copy()
@@ -177,7 +202,58 @@ output_df.loc[top_k_indices, "top_10pct_flag"] = 1
 output_df.to_csv("outputs/session_predictions.csv", index=False)
 
 # Save top 10% of sessions by conversion probability
-top_k = int(0.10 * len(output_df))
-top_sessions = output_df.nlargest(top_k, "p_conversion")
+top_sessions = output_df.take(top_k_indices)
 top_sessions.to_csv("outputs/top_10pct_sessions.csv", index=False)
-print(f"Saved top {top_k} high-probability sessions to outputs/top_10pct_sessions.csv")
\ No newline at end of file
+print(f"Saved top {k} high-probability sessions to outputs/top_10pct_sessions.csv")
+
+# Memory report
+def matrix_mb(m):
+    return (m.data.nbytes + m.indices.nbytes + m.indptr.nbytes if sp.issparse(m) else m.nbytes) / 2**20
+
+print(f"Encoded train matrix: {X_train_enc.shape[0]:,} x {X_train_enc.shape[1]:,}, "
+      f"{matrix_mb(X_train_enc):.1f} MB ({'CSR' if args.sparse else 'dense'})")
+print(f"Peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+# ── plots: only after the artifact and predictions are written, so an interactive
+# window can't hold them up; saved to outputs/, shown on screen with --show ──
+import matplotlib
+
+if not args.show:
+    matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import seaborn as sns
+
+# Top 15 feature importances
+importances = model.feature_importances_
+encoded_cat_names = preprocessor.named_transformers_['cat'].get_feature_names_out(categorical_cols)
+all_feature_names = np.concatenate([encoded_cat_names, numerical_cols])
+
+importance_df = pd.DataFrame({
+    "feature": all_feature_names,
+    "importance": importances
+}).sort_values(by="importance", ascending=False)
+
+top_features = importance_df.head(15)
+
+plt.figure(figsize=(10, 6))
+plt.barh(top_features["feature"][::-1], top_features["importance"][::-1])
+plt.xlabel("Feature Importance")
+plt.title("Top 15 Feature Importances (XGBoost)")
+plt.tight_layout()
+plt.grid(axis='x')
+plt.savefig(IMPORTANCE_PLOT)
+
+# Lift Chart
+plt.figure(figsize=(8, 5))
+sns.lineplot(data=lift_table, x="bucket", y="lift", marker="o")
+plt.axhline(1.0, linestyle="--", color="gray")
+plt.title("Lift Chart (Decile Buckets)")
+plt.xlabel("Decile (0 = Top Scoring)")
+plt.ylabel("Lift over Baseline")
+plt.grid(True)
+plt.tight_layout()
+plt.savefig(LIFT_PLOT)
+print(f"Saved plots to {IMPORTANCE_PLOT} and {LIFT_PLOT}")
+
+if args.show:
+    plt.show()
@@ -0,0 +1,20 @@
+import numpy as np
+import pandas as pd
+
+from scripts.features import combine_categories
+
+
+def test_combine_categories_pairs_present_values():
+    combo = combine_categories(pd.Series(["desktop", "mobile", None]), pd.Series(["google", None, "google"]))
+    assert list(combo.categories) == ["desktop_google"]
+    assert combo.codes.tolist() == [0, -1, -1]
+
+
+def test_combine_categories_all_null_side():
+    # e.g. a single scoring-service request with "source": null
+    combo = combine_categories(pd.Series(["desktop"]), pd.Series([None], dtype=object))
+    assert len(combo.categories) == 0
+    assert np.all(combo.codes == -1)
+
+    combo = combine_categories(pd.Series([None, None], dtype=object), pd.Series([None, None], dtype=object))
+    assert combo.codes.tolist() == [-1, -1]